@@ -0,0 +1,36 @@
+"""project keyset index
+
+Revision ID: 3f1c9a2d7b44
+Revises: 6cb0dede5a07
+Create Date: 2026-10-18 09:12:41.503318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a2d7b44'
+down_revision: Union[str, None] = '6cb0dede5a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_projects_owner_id_created_at_id',
+        'projects',
+        ['owner_id', 'created_at', 'id'],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        'ix_projects_owner_id_created_at_id',
+        table_name='projects',
+        if_exists=True,
+    )
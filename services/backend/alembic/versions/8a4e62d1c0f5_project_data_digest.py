@@ -0,0 +1,72 @@
+"""project data digest
+
+Revision ID: 8a4e62d1c0f5
+Revises: 3f1c9a2d7b44
+Create Date: 2026-10-18 10:04:17.928441
+
+"""
+import json
+import hashlib
+from typing import Any, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e62d1c0f5'
+down_revision: Union[str, None] = '3f1c9a2d7b44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _digest(data: str) -> dict[str, Any]:
+    try:
+        parsed = json.loads(data)
+    except (json.JSONDecodeError, TypeError):
+        parsed = None
+
+    canvas = parsed.get('canvas') if isinstance(parsed, dict) else None
+    nodes = canvas.get('nodes') if isinstance(canvas, dict) else None
+    if not isinstance(nodes, dict):
+        nodes = {}
+
+    return {
+        'node_count': len(nodes),
+        'service_count': sum(
+            1
+            for node in nodes.values()
+            if isinstance(node, dict) and node.get('type') == 'SERVICE'
+        ),
+        'data_hash': hashlib.sha256(data.encode('utf-8')).hexdigest(),
+    }
+
+
+def upgrade() -> None:
+    op.add_column('projects', sa.Column('node_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('projects', sa.Column('service_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('projects', sa.Column('data_hash', sa.String(length=64), nullable=True))
+
+    connection = op.get_bind()
+    projects = sa.table(
+        'projects',
+        sa.column('id', sa.Integer),
+        sa.column('data', sa.Text),
+        sa.column('node_count', sa.Integer),
+        sa.column('service_count', sa.Integer),
+        sa.column('data_hash', sa.String),
+    )
+
+    rows = connection.execute(sa.select(projects.c.id, projects.c.data))
+    for project_id, data in rows.fetchall():
+        connection.execute(
+            projects.update()
+            .where(projects.c.id == project_id)
+            .values(**_digest(data))
+        )
+
+
+def downgrade() -> None:
+    op.drop_column('projects', 'data_hash')
+    op.drop_column('projects', 'service_count')
+    op.drop_column('projects', 'node_count')
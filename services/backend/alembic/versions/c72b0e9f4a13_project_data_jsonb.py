@@ -0,0 +1,95 @@
+"""project data jsonb
+
+Revision ID: c72b0e9f4a13
+Revises: 8a4e62d1c0f5
+Create Date: 2026-10-18 11:26:55.118204
+
+"""
+import json
+import hashlib
+from typing import Any, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c72b0e9f4a13'
+down_revision: Union[str, None] = '8a4e62d1c0f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _unwrap(data: str) -> Any:
+    try:
+        parsed = json.loads(data)
+        while isinstance(parsed, str):
+            parsed = json.loads(parsed)
+        return parsed
+    except (json.JSONDecodeError, TypeError):
+        return data
+
+
+def _count_nodes(data: Any) -> tuple[int, int]:
+    canvas = data.get('canvas') if isinstance(data, dict) else None
+    nodes = canvas.get('nodes') if isinstance(canvas, dict) else None
+    if not isinstance(nodes, dict):
+        return 0, 0
+
+    services = sum(
+        1
+        for node in nodes.values()
+        if isinstance(node, dict) and node.get('type') == 'SERVICE'
+    )
+    return len(nodes), services
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    projects = sa.table(
+        'projects',
+        sa.column('id', sa.Integer),
+        sa.column('data', sa.Text),
+        sa.column('node_count', sa.Integer),
+        sa.column('service_count', sa.Integer),
+        sa.column('data_hash', sa.String),
+    )
+
+    # Rows were saved as JSON text, some of them encoded more than once.
+    # Rewrite every row as a single encoding so the cast below succeeds.
+    rows = connection.execute(sa.select(projects.c.id, projects.c.data))
+    for project_id, data in rows.fetchall():
+        parsed = _unwrap(data)
+        canonical = json.dumps(parsed, sort_keys=True, separators=(',', ':'))
+        node_count, service_count = _count_nodes(parsed)
+        connection.execute(
+            projects.update()
+            .where(projects.c.id == project_id)
+            .values(
+                data=json.dumps(parsed),
+                node_count=node_count,
+                service_count=service_count,
+                data_hash=hashlib.sha256(canonical.encode('utf-8')).hexdigest(),
+            )
+        )
+
+    op.alter_column(
+        'projects',
+        'data',
+        type_=postgresql.JSONB(),
+        existing_type=sa.Text(),
+        existing_nullable=False,
+        postgresql_using='data::jsonb',
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        'projects',
+        'data',
+        type_=sa.Text(),
+        existing_type=postgresql.JSONB(),
+        existing_nullable=False,
+        postgresql_using='data::text',
+    )
@@ -0,0 +1,29 @@
+"""project version
+
+Revision ID: d4b8e1f27a60
+Revises: c72b0e9f4a13
+Create Date: 2026-10-18 14:21:09.274518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b8e1f27a60'
+down_revision: Union[str, None] = 'c72b0e9f4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'projects',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('projects', 'version')
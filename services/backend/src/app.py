@@ -1,50 +1,101 @@
-import copy
-import json
+import os
 import uuid
-import yaml
+import time
 import random
 import string
+import asyncio
 import hashlib
 
-import requests
-
 from datetime import UTC, datetime
-from typing import Any
+from functools import partial
+from typing import Any, Callable
 
 from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy import desc, or_
-from sqlalchemy.orm import Session
-
-from database import Base, engine, get_db
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import case, delete, desc, insert, or_, select, true, tuple_, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, defer, undefer
+
+from cache import TTLCache
+from database import Base, Database, engine, get_db
+from generation_cache import cached_generation
+from json_patch import JsonPatchError, apply_json_patch, apply_merge_patch
 from manifest_generation import (
-    generate_docker_compose_yaml,
+    KomposeBusy,
+    compose_fragments,
     generate_kubernetes_manifest,
+    iter_docker_compose_yaml,
+    iter_manifests_yaml,
+    kompose_pool,
+    kubernetes_manifests,
+    render_docker_compose_yaml,
 )
+from metrics import RequestMetricsMiddleware, render_prometheus
 from models import Project, User
-from security import create_access_token, decode_token, hash_password, verify_password
+from project_import import (
+    IMPORT_BULK_MAX_ITEMS,
+    IMPORT_MAX_BYTES,
+    ImportFetchError,
+    ImportParseError,
+    close_http_client,
+    close_parse_pool,
+    fetch_import_source,
+    fetch_import_sources,
+    parse_import_source,
+    parse_import_sources,
+)
+from responses import FastJSONResponse, dumps, loads
+from security import (
+    PasswordHasherBusy,
+    create_access_token,
+    decode_token,
+    hash_password_async,
+    verify_password_async,
+)
 from utils import (
-    DEFAULT_PROJECT,
+    CanvasBuilder,
+    PROJECT_RESPONSE_COLUMNS,
     auth_success_payload,
-    build_network_node,
     build_pagination_urls,
-    build_service_node,
-    build_volume_node,
-    can_edit_project,
+    can_edit_project_clause,
     can_read_project,
-    extract_depends_on,
-    extract_service_volume_mounts,
+    decode_cursor,
+    encode_cursor,
     get_current_user,
     get_optional_current_user,
+    get_optional_reader,
     get_payload,
+    if_match_revisions,
+    if_none_match_revisions,
     normalize_project_data,
+    project_data_values,
+    project_etag,
+    project_revision_in,
     serialize_project,
+    serialize_project_summary,
+    user_token_claims,
     _serialize_user,
 )
 
 
-app = FastAPI(title="Container Toolkit API", version="1.0.0")
+PROJECT_COUNT_CACHE_TTL = float(os.getenv("PROJECT_COUNT_CACHE_TTL", "30"))
+PUBLIC_PROJECT_CACHE_MAX_AGE = int(os.getenv("PUBLIC_PROJECT_CACHE_MAX_AGE", "30"))
+PATCHABLE_FIELDS = {"name", "visibility", "data"}
+JSON_PATCH_MEDIA_TYPE = "application/json-patch+json"
+IMPORT_BULK_BATCH_SIZE = int(os.getenv("IMPORT_BULK_BATCH_SIZE", "500"))
+GENERATE_BATCH_MAX_VARIANTS = int(os.getenv("GENERATE_BATCH_MAX_VARIANTS", "16"))
+
+app = FastAPI(
+    title="Container Toolkit API",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+)
+
+# owner_id -> total projects, used by keyset pagination instead of a COUNT(*)
+# per page.
+_project_count_cache: TTLCache[int] = TTLCache(4096, PROJECT_COUNT_CACHE_TTL)
 
 app.add_middleware(
     CORSMiddleware,
@@ -52,16 +103,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Cache", "X-Generation-Error"],
 )
+app.add_middleware(RequestMetricsMiddleware)
 
 
 def init_database() -> None:
     Base.metadata.create_all(bind=engine)
 
 
+@app.exception_handler(PasswordHasherBusy)
+def _password_hasher_busy(request: Request, error: PasswordHasherBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many authentication requests, try again shortly."},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(KomposeBusy)
+def _kompose_busy(request: Request, error: KomposeBusy) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many Kubernetes conversions, try again shortly."},
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.on_event("startup")
 def _startup() -> None:
     init_database()
+    kompose_pool.warm()
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    await close_http_client()
+    close_parse_pool()
+    kompose_pool.close()
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    return Response(
+        render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 @app.get("/")
@@ -70,22 +156,50 @@ def health() -> dict[str, Any]:
 
 
 @app.get("/projects/")
-def list_projects(
+async def list_projects(
     request: Request,
     limit: int = 300,
     offset: int = 0,
-    current_user: User | None = Depends(get_optional_current_user),
-    db: Session = Depends(get_db),
-) -> dict[str, Any]:
+    cursor: str | None = None,
+    view: str | None = None,
+    current_user: User | None = Depends(get_optional_reader),
+    db: Database = Depends(get_db),
+) -> FastJSONResponse:
     limit = max(1, min(limit, 1000))
     offset = max(0, offset)
+    return FastJSONResponse(
+        await db.run(_list_projects, request, limit, offset, cursor, view, current_user)
+    )
+
+
+def _list_projects(
+    session: Session,
+    request: Request,
+    limit: int,
+    offset: int,
+    cursor: str | None,
+    view: str | None,
+    current_user: User | None,
+) -> dict[str, Any]:
+    owner_id = current_user.id if current_user else None
+
+    query = session.query(Project).options(defer(Project.data))
+    if view == "summary":
+        serializer = serialize_project_summary
+    else:
+        query = query.options(undefer(Project.data_json))
+        serializer = partial(serialize_project, raw_data=True)
 
-    query = db.query(Project)
     if current_user:
         query = query.filter(Project.owner_id == current_user.id)
     else:
         query = query.filter(Project.owner_id.is_(None))
 
+    if cursor is not None:
+        return _list_projects_keyset(
+            request, query, serializer, owner_id, limit, cursor
+        )
+
     count = query.count()
     projects = (
         query.order_by(desc(Project.created_at)).offset(offset).limit(limit).all()
@@ -96,7 +210,51 @@ def list_projects(
         "count": count,
         "next": next_url,
         "previous": previous_url,
-        "results": [serialize_project(project) for project in projects],
+        "results": [serializer(project) for project in projects],
+    }
+
+
+def _list_projects_keyset(
+    request: Request,
+    query: Any,
+    serializer: Callable[[Any], dict[str, Any]],
+    owner_id: int | None,
+    limit: int,
+    cursor: str,
+) -> dict[str, Any]:
+    # The total is served from a short-lived cache; only a cold first page
+    # pays for the COUNT(*), deeper pages report null instead.
+    count = _project_count_cache.get(owner_id)
+    if count is None and not cursor:
+        count = query.count()
+        _project_count_cache.set(owner_id, count)
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(Project.created_at, Project.id) < tuple_(*position))
+
+    projects = (
+        query.order_by(desc(Project.created_at), desc(Project.id))
+        .limit(limit + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(projects) > limit:
+        projects = projects[:limit]
+        next_cursor = encode_cursor(projects[-1].created_at, projects[-1].id)
+
+    next_url, previous_url = build_pagination_urls(
+        request, limit, None, None, next_cursor=next_cursor
+    )
+
+    return {
+        "count": count,
+        "next": next_url,
+        "previous": previous_url,
+        "results": [serializer(project) for project in projects],
     }
 
 
@@ -104,30 +262,50 @@ def list_projects(
 async def create_project(
     request: Request,
     current_user: User | None = Depends(get_optional_current_user),
-    db: Session = Depends(get_db),
-) -> dict[str, Any]:
+    db: Database = Depends(get_db),
+) -> FastJSONResponse:
     payload = await get_payload(request)
-
-    project = Project(
-        owner_id=current_user.id if current_user else None,
-        uuid=str(uuid.uuid4())[:10],
-        name=str(payload.get("name") or "Untitled"),
-        visibility=int(payload.get("visibility", 0)),
-        data=normalize_project_data(payload.get("data")),
+    owner_id = current_user.id if current_user else None
+
+    statement = (
+        insert(Project.__table__)
+        .values(
+            owner_id=owner_id,
+            uuid=str(uuid.uuid4())[:10],
+            name=str(payload.get("name") or "Untitled"),
+            visibility=int(payload.get("visibility", 0)),
+            **project_data_values(normalize_project_data(payload.get("data"))),
+        )
+        .returning(*PROJECT_RESPONSE_COLUMNS)
     )
 
-    db.add(project)
-    db.commit()
-    db.refresh(project)
-    return serialize_project(project)
+    row = await db.run(_write_returning, statement)
+    _project_count_cache.pop(owner_id)
+    return _project_response(row, status_code=201)
+
+
+def _write_returning(session: Session, statement: Any) -> Any:
+    # One round-trip per write: the statement returns the columns the
+    # response needs instead of being followed by a refresh.
+    row = session.execute(statement).first()
+    session.commit()
+    return row
+
+
+def _project_response(row: Any, status_code: int = 200) -> FastJSONResponse:
+    return FastJSONResponse(
+        serialize_project(row, raw_data=True),
+        status_code=status_code,
+        headers={"ETag": project_etag(row.id, row.version)},
+    )
 
 
 @app.post("/projects/import/", status_code=201)
 async def import_project(
     request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-) -> dict[str, Any]:
+    db: Database = Depends(get_db),
+) -> FastJSONResponse:
     payload = await get_payload(request)
     import_url = payload.get("url")
 
@@ -135,147 +313,286 @@ async def import_project(
         raise HTTPException(status_code=400, detail="Missing 'url' in request payload")
 
     try:
-        response = requests.get(import_url, allow_redirects=True, timeout=20)
-        response.raise_for_status()
-    except requests.RequestException as error:
+        content = await fetch_import_source(str(import_url))
+    except ImportFetchError as error:
         raise HTTPException(status_code=400, detail=str(error)) from error
 
-    imported = yaml.safe_load(response.content) or {}
+    try:
+        imported = await run_in_threadpool(parse_import_source, content)
+    except ImportParseError as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
 
     if not isinstance(imported, dict):
         raise HTTPException(status_code=400, detail="Imported YAML must be an object")
 
-    project_data = copy.deepcopy(DEFAULT_PROJECT)
-    node_order: dict[str, int] = {}
-    services = (
-        imported.get("services", {})
-        if isinstance(imported.get("services"), dict)
-        else {}
-    )
-    volumes = (
-        imported.get("volumes", {}) if isinstance(imported.get("volumes"), dict) else {}
-    )
-    networks = (
-        imported.get("networks", {})
-        if isinstance(imported.get("networks"), dict)
-        else {}
+    # deterministic_ids derives node ids from the URL, so importing the same
+    # file again produces the same canvas.
+    namespace = str(import_url) if payload.get("deterministic_ids") else None
+    try:
+        data_values = _imported_project_values(imported, namespace)
+    except ImportParseError as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+
+    project_uuid = _import_project_uuid(str(import_url))
+    visibility = int(payload.get("visibility", 0))
+
+    # Re-importing into one of the user's own projects overwrites it; the
+    # upsert's WHERE keeps other owners' projects untouched.
+    statement = postgresql.insert(Project.__table__).values(
+        owner_id=current_user.id,
+        name=project_uuid,
+        uuid=project_uuid,
+        visibility=visibility,
+        **data_values,
     )
-    service_name_uuid: dict[str, str] = {}
-    volume_name_uuid: dict[str, str] = {}
-    network_name_uuid: dict[str, str] = {}
-    counter = 0
-
-    for service_name in services:
-        generated_uuid = f"service-{uuid.uuid4()}"
-        service_name_uuid[service_name] = generated_uuid
-        node_order[generated_uuid] = counter
-        counter += 1
-
-    for volume_name in volumes:
-        generated_uuid = f"volume-{uuid.uuid4()}"
-        volume_name_uuid[volume_name] = generated_uuid
-        node_order[generated_uuid] = counter
-        counter += 1
-
-    for network_name in networks:
-        generated_uuid = f"network-{uuid.uuid4()}"
-        network_name_uuid[network_name] = generated_uuid
-        node_order[generated_uuid] = counter
-        counter += 1
-
-    for service_name, service_config in services.items():
-        service_uuid = service_name_uuid[service_name]
-        project_data["canvas"]["nodes"][service_uuid] = build_service_node(
-            service_name,
-            service_uuid,
-            service_config,
-            node_order[service_uuid],
+    statement = statement.on_conflict_do_update(
+        index_elements=[Project.uuid],
+        set_={
+            **data_values,
+            "visibility": visibility,
+            "updated_at": datetime.now(UTC),
+            "version": Project.version + 1,
+        },
+        where=Project.owner_id == current_user.id,
+    ).returning(*PROJECT_RESPONSE_COLUMNS)
+
+    row = await db.run(_write_returning, statement)
+    if row is None:
+        raise HTTPException(status_code=409, detail="Project already exists")
+
+    _project_count_cache.pop(current_user.id)
+    return _project_response(row, status_code=201)
+
+
+@app.post("/projects/import/bulk/")
+async def import_projects_bulk(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Database = Depends(get_db),
+) -> dict[str, Any]:
+    # Takes {"urls": [...]} as JSON, or multipart form data with any number
+    # of "url" fields and "files" uploads. Every item gets its own status;
+    # one failing URL or file does not fail the request.
+    started_at = time.perf_counter()
+    sources, contents, options = await _bulk_import_sources(request)
+
+    if not sources:
+        raise HTTPException(status_code=400, detail="Nothing to import")
+    if len(sources) > IMPORT_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {IMPORT_BULK_MAX_ITEMS} items can be imported at once",
         )
 
-        for dependency in extract_depends_on(service_config.get("depends_on")):
-            dependency_uuid = service_name_uuid.get(dependency)
+    items: list[dict[str, Any]] = [
+        {"source": source, "status": "pending"} for source in sources
+    ]
+    urls = {
+        index: source for index, source in enumerate(sources) if index not in contents
+    }
+    fetched = await fetch_import_sources(list(urls.values()))
+    for index, result in zip(urls, fetched):
+        if isinstance(result, ImportFetchError):
+            items[index].update(status="error", detail=str(result))
+        else:
+            contents[index] = result
+
+    parse_order = sorted(contents)
+    parsed = await parse_import_sources([contents[index] for index in parse_order])
+
+    documents: dict[int, dict[str, Any]] = {}
+    for index, (imported, error) in zip(parse_order, parsed):
+        if error is not None:
+            items[index].update(status="error", detail=error)
+        elif not isinstance(imported, dict):
+            items[index].update(
+                status="error", detail="Imported YAML must be an object"
+            )
+        else:
+            documents[index] = imported
+
+    rows, errors = await run_in_threadpool(
+        _bulk_import_rows, documents, sources, current_user.id, options
+    )
+    for index, error in errors.items():
+        items[index].update(status="error", detail=error)
+    inserted = await db.run(_insert_project_batches, list(rows.values()))
+    for index, row in rows.items():
+        if row["uuid"] in inserted:
+            items[index].update(status="created", uuid=row["uuid"])
+        else:
+            items[index].update(status="error", detail="Project already exists")
+
+    if inserted:
+        _project_count_cache.pop(current_user.id)
+
+    elapsed = time.perf_counter() - started_at
+    return {
+        "items": items,
+        "created": len(inserted),
+        "failed": len(items) - len(inserted),
+        "seconds": round(elapsed, 3),
+        "items_per_second": round(len(items) / elapsed, 1) if elapsed else None,
+    }
 
-            if dependency_uuid:
-                project_data["canvas"]["connections"].append(
-                    [service_uuid, dependency_uuid]
-                )
 
-        for volume_mount in extract_service_volume_mounts(
-            service_config.get("volumes")
-        ):
-            volume_uuid = volume_name_uuid.get(volume_mount)
-
-            if volume_uuid:
-                project_data["canvas"]["connections"].append(
-                    [volume_uuid, service_uuid]
-                )
-
-    for volume_name, volume_config in volumes.items():
-        volume_uuid = volume_name_uuid[volume_name]
-        project_data["canvas"]["nodes"][volume_uuid] = build_volume_node(
-            volume_name,
-            volume_uuid,
-            volume_config if isinstance(volume_config, dict) else {},
-            node_order[volume_uuid],
+async def _bulk_import_sources(
+    request: Request,
+) -> tuple[list[str], dict[int, bytes], dict[str, Any]]:
+    # Returns the item labels (URL or file name), the contents of uploaded
+    # files by item index, and the options that apply to every item.
+    content_type = request.headers.get("Content-Type", "")
+    if not content_type.startswith("multipart/form-data"):
+        payload = await get_payload(request)
+        urls = payload.get("urls")
+        if not isinstance(urls, list):
+            raise HTTPException(
+                status_code=400, detail="Missing 'urls' in request payload"
+            )
+        options = {
+            "visibility": int(payload.get("visibility", 0)),
+            "deterministic_ids": bool(payload.get("deterministic_ids")),
+        }
+        return [str(url) for url in urls], {}, options
+
+    form = await request.form(
+        max_files=IMPORT_BULK_MAX_ITEMS, max_fields=IMPORT_BULK_MAX_ITEMS + 1
+    )
+    sources = [str(url) for url in form.getlist("url")]
+    contents: dict[int, bytes] = {}
+    for upload in form.getlist("files"):
+        if isinstance(upload, str):
+            continue
+        content = await upload.read(IMPORT_MAX_BYTES + 1)
+        if len(content) > IMPORT_MAX_BYTES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{upload.filename} exceeds {IMPORT_MAX_BYTES} bytes",
+            )
+        contents[len(sources)] = content
+        sources.append(upload.filename or f"upload-{len(sources)}")
+    options = {
+        "visibility": int(form.get("visibility") or 0),
+        "deterministic_ids": form.get("deterministic_ids") in {"1", "true"},
+    }
+    return sources, contents, options
+
+
+def _bulk_import_rows(
+    documents: dict[int, dict[str, Any]],
+    sources: list[str],
+    owner_id: int,
+    options: dict[str, Any],
+) -> tuple[dict[int, dict[str, Any]], dict[int, str]]:
+    # Returns the rows to insert and the errors of documents that could not
+    # be turned into a project, both by item index.
+    rows: dict[int, dict[str, Any]] = {}
+    errors: dict[int, str] = {}
+    for index, imported in documents.items():
+        source = sources[index]
+        namespace = source if options["deterministic_ids"] else None
+        try:
+            data_values = _imported_project_values(imported, namespace)
+        except ImportParseError as error:
+            errors[index] = str(error)
+            continue
+
+        project_uuid = _import_project_uuid(source)
+        rows[index] = {
+            "owner_id": owner_id,
+            "name": project_uuid,
+            "uuid": project_uuid,
+            "visibility": options["visibility"],
+            **data_values,
+        }
+    return rows, errors
+
+
+def _imported_project_values(
+    imported: dict[str, Any], namespace: str | None
+) -> dict[str, Any]:
+    # Values JSON cannot hold, such as !!binary or !!set nodes, fail the
+    # document rather than the request. The check runs the serializer the
+    # engine binds JSONB with, so nothing it rejects reaches a batch INSERT.
+    try:
+        values = project_data_values(CanvasBuilder(namespace).build(imported))
+        dumps(values["data"])
+    except (TypeError, ValueError) as error:
+        raise ImportParseError(f"Imported YAML cannot be stored: {error}") from error
+    return values
+
+
+def _insert_project_batches(session: Session, rows: list[dict[str, Any]]) -> set[str]:
+    # One multi-row INSERT per batch. Unlike the single import, a uuid that
+    # already exists is reported back instead of being overwritten.
+    inserted: set[str] = set()
+    for start in range(0, len(rows), IMPORT_BULK_BATCH_SIZE):
+        statement = (
+            postgresql.insert(Project.__table__)
+            .values(rows[start : start + IMPORT_BULK_BATCH_SIZE])
+            .on_conflict_do_nothing(index_elements=[Project.uuid])
+            .returning(Project.uuid)
         )
+        inserted.update(session.execute(statement).scalars())
+        session.commit()
+    return inserted
 
-    for network_name, network_config in networks.items():
-        network_uuid = network_name_uuid[network_name]
-        project_data["canvas"]["nodes"][network_uuid] = build_network_node(
-            network_name,
-            network_uuid,
-            network_config,
-            node_order[network_uuid],
-        )
 
+def _import_project_uuid(source: str) -> str:
     project_hash = str(
-        int(hashlib.sha1(import_url.encode("utf-8")).hexdigest(), 16) % (10**8)
+        int(hashlib.sha1(source.encode("utf-8")).hexdigest(), 16) % (10**8)
     )
     hash_prefix = "".join(chr(ord("a") + int(digit)) for digit in project_hash)
     random_suffix = "".join(random.choices(string.ascii_lowercase, k=5))
-    project_uuid = f"{hash_prefix}_{random_suffix}"
-
-    existing = (
-        db.query(Project)
-        .filter(Project.uuid == project_uuid, Project.owner_id == current_user.id)
-        .first()
-    )
-
-    if existing:
-        existing.data = json.dumps(project_data)
-        existing.visibility = int(payload.get("visibility", 0))
-        existing.updated_at = datetime.now(UTC)
-        db.commit()
-        db.refresh(existing)
-        return serialize_project(existing)
-
-    project = Project(
-        owner_id=current_user.id,
-        name=project_uuid,
-        uuid=project_uuid,
-        visibility=int(payload.get("visibility", 0)),
-        data=json.dumps(project_data),
-    )
-    db.add(project)
-    db.commit()
-    db.refresh(project)
-    return serialize_project(project)
+    return f"{hash_prefix}_{random_suffix}"
 
 
 @app.get("/projects/{project_uuid}/")
-def get_project(
+async def get_project(
     project_uuid: str,
-    current_user: User | None = Depends(get_optional_current_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    current_user: User | None = Depends(get_optional_reader),
+    db: Database = Depends(get_db),
 ) -> Any:
-    project = db.query(Project).filter(Project.uuid == project_uuid).first()
+    revisions = if_none_match_revisions(request.headers.get("If-None-Match"))
+    # When the client's copy is current the CASE leaves data_json NULL, so
+    # Postgres never reads (or detoasts) the canvas for a 304.
+    not_modified = project_revision_in(revisions) if revisions is not None else true()
+    columns = [
+        (
+            case((not_modified, None), else_=column).label("data_json")
+            if column.name == "data_json"
+            else column
+        )
+        for column in PROJECT_RESPONSE_COLUMNS
+    ]
+    project = await db.run(
+        lambda session: session.execute(
+            select(*columns).where(Project.uuid == project_uuid)
+        ).first()
+    )
     if not project:
         return JSONResponse(content={}, status_code=404)
 
     if not can_read_project(project, current_user):
         return JSONResponse(content={}, status_code=404)
 
-    return serialize_project(project)
+    headers = {
+        "ETag": project_etag(project.id, project.version),
+        "Cache-Control": _project_cache_control(project),
+        "Vary": "Authorization",
+    }
+    if project.data_json is None:
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(serialize_project(project, raw_data=True), headers=headers)
+
+
+def _project_cache_control(project: Any) -> str:
+    # Shared projects may be stored by a CDN or reverse proxy for a short
+    # while; everything else has to be revalidated by the browser.
+    if project.visibility == 1:
+        return f"public, max-age=0, s-maxage={PUBLIC_PROJECT_CACHE_MAX_AGE}"
+    return "private, no-cache"
 
 
 @app.put("/projects/{project_uuid}/")
@@ -283,82 +600,282 @@ async def update_project(
     project_uuid: str,
     request: Request,
     current_user: User | None = Depends(get_optional_current_user),
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
 ) -> Any:
-    project = db.query(Project).filter(Project.uuid == project_uuid).first()
-    if not project:
-        return JSONResponse(content={}, status_code=404)
-
-    if not can_edit_project(project, current_user):
-        return JSONResponse(content={}, status_code=404)
-
     payload = await get_payload(request)
+    revisions = if_match_revisions(request.headers.get("If-Match"))
+    values: dict[str, Any] = {
+        "updated_at": datetime.now(UTC),
+        "version": Project.version + 1,
+    }
 
     if "name" in payload:
-        project.name = str(payload["name"])
+        values["name"] = str(payload["name"])
 
     if "visibility" in payload:
-        project.visibility = int(payload["visibility"])
+        values["visibility"] = int(payload["visibility"])
 
     if "data" in payload:
-        project.data = normalize_project_data(payload["data"])
+        values.update(project_data_values(normalize_project_data(payload["data"])))
+
+    # A missing project and one the caller cannot edit both match no row.
+    statement = (
+        update(Project.__table__)
+        .where(Project.uuid == project_uuid, can_edit_project_clause(current_user))
+        .values(**values)
+        .returning(*PROJECT_RESPONSE_COLUMNS)
+    )
+    if revisions is not None:
+        statement = statement.where(project_revision_in(revisions))
+
+    row = await db.run(_write_returning, statement)
+    if row is None:
+        if revisions is not None and await db.run(
+            _editable_project_exists, project_uuid, current_user
+        ):
+            raise _precondition_failed()
+        return JSONResponse(content={}, status_code=404)
+    return _project_response(row)
+
 
-    project.updated_at = datetime.now(UTC)
+@app.patch("/projects/{project_uuid}/")
+async def patch_project(
+    project_uuid: str,
+    request: Request,
+    current_user: User | None = Depends(get_optional_current_user),
+    db: Database = Depends(get_db),
+) -> Any:
+    # The body is a JSON Merge Patch, or a JSON Patch when sent as
+    # application/json-patch+json, against {"name", "visibility", "data"}.
+    content_type = request.headers.get("Content-Type", "")
+    json_patch = content_type.split(";")[0].strip().lower() == JSON_PATCH_MEDIA_TYPE
+
+    try:
+        patch = loads(await request.body() or b"null")
+    except ValueError as error:
+        raise HTTPException(
+            status_code=400, detail="Invalid request payload"
+        ) from error
+
+    row = await db.run(
+        _patch_project,
+        project_uuid,
+        current_user,
+        patch,
+        json_patch,
+        if_match_revisions(request.headers.get("If-Match")),
+    )
+    if row is None:
+        return JSONResponse(content={}, status_code=404)
+    return _project_response(row)
+
+
+def _precondition_failed() -> HTTPException:
+    return HTTPException(
+        status_code=412, detail="The project was modified by another request."
+    )
+
+
+def _editable_project_exists(
+    session: Session, project_uuid: str, current_user: User | None
+) -> bool:
+    return (
+        session.query(Project.id)
+        .filter(Project.uuid == project_uuid, can_edit_project_clause(current_user))
+        .first()
+        is not None
+    )
+
+
+def _patch_project(
+    session: Session,
+    project_uuid: str,
+    current_user: User | None,
+    patch: Any,
+    json_patch: bool,
+    revisions: set[tuple[int, int]] | None,
+) -> Any:
+    # The row stays locked between reading and writing the patched document,
+    # so concurrent patches apply one after the other instead of losing edits.
+    # If-Match lets clients detect changes made since they last read it.
+    current = session.execute(
+        select(
+            Project.id, Project.version, Project.name, Project.visibility, Project.data
+        )
+        .where(Project.uuid == project_uuid, can_edit_project_clause(current_user))
+        .with_for_update()
+    ).first()
+    if current is None:
+        return None
+    if revisions is not None and (current.id, current.version) not in revisions:
+        raise _precondition_failed()
+
+    document = {
+        "name": current.name,
+        "visibility": current.visibility,
+        "data": current.data,
+    }
+    try:
+        if json_patch:
+            document = apply_json_patch(document, patch)
+        else:
+            document = apply_merge_patch(document, patch)
+    except JsonPatchError as error:
+        raise HTTPException(status_code=422, detail=str(error)) from error
+
+    if not isinstance(document, dict) or not set(document) <= PATCHABLE_FIELDS:
+        raise HTTPException(
+            status_code=422, detail="Only name, visibility and data can be patched"
+        )
 
-    db.commit()
-    db.refresh(project)
-    return serialize_project(project)
+    try:
+        values = {
+            "name": str(document.get("name") or "Untitled"),
+            "visibility": int(document.get("visibility", 0)),
+            "updated_at": datetime.now(UTC),
+            "version": current.version + 1,
+            **project_data_values(normalize_project_data(document.get("data"))),
+        }
+    except (TypeError, ValueError) as error:
+        raise HTTPException(status_code=422, detail=str(error)) from error
+
+    return _write_returning(
+        session,
+        update(Project.__table__)
+        .where(Project.uuid == project_uuid)
+        .values(**values)
+        .returning(*PROJECT_RESPONSE_COLUMNS),
+    )
 
 
 @app.delete("/projects/{project_uuid}/")
-def delete_project(
+async def delete_project(
     project_uuid: str,
     current_user: User | None = Depends(get_optional_current_user),
-    db: Session = Depends(get_db),
+    db: Database = Depends(get_db),
 ) -> Any:
-    project = db.query(Project).filter(Project.uuid == project_uuid).first()
-    if not project:
-        return JSONResponse(content={}, status_code=404)
+    statement = (
+        delete(Project.__table__)
+        .where(Project.uuid == project_uuid, can_edit_project_clause(current_user))
+        .returning(Project.owner_id)
+    )
 
-    if not can_edit_project(project, current_user):
+    row = await db.run(_write_returning, statement)
+    if row is None:
         return JSONResponse(content={}, status_code=404)
 
-    db.delete(project)
-    db.commit()
+    _project_count_cache.pop(row.owner_id)
     return Response(status_code=204)
 
 
-@app.post("/generate/")
-async def generate_docker_compose(request: Request) -> dict[str, str]:
-    payload = await get_payload(request)
+def _generation_data(payload: dict[str, Any]) -> dict[str, Any]:
     data = payload.get("data", {})
     if not isinstance(data, dict):
         raise HTTPException(
             status_code=400, detail="Expected payload.data to be an object"
         )
+    return data
+
+
+async def _compose_result(data: dict[str, Any]) -> dict[str, str]:
+    return {
+        "code": await run_in_threadpool(
+            render_docker_compose_yaml, data, compose_fragments
+        )
+    }
 
-    return {"code": generate_docker_compose_yaml(data)}
+
+@app.post("/generate/")
+async def generate_docker_compose(
+    request: Request, response: Response
+) -> dict[str, str]:
+    data = _generation_data(await get_payload(request))
+    result, hit = await cached_generation("docker-compose", data, _compose_result)
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return result
 
 
 @app.post("/generate/docker-compose")
-async def generate_docker_compose_alias(request: Request) -> dict[str, str]:
-    return await generate_docker_compose(request)
+async def generate_docker_compose_alias(
+    request: Request, response: Response
+) -> dict[str, str]:
+    return await generate_docker_compose(request, response)
 
 
 @app.post("/generate/kubernetes")
-async def generate_kubernetes(request: Request) -> dict[str, str]:
+async def generate_kubernetes(request: Request, response: Response) -> dict[str, str]:
+    data = _generation_data(await get_payload(request))
+    result, hit = await cached_generation(
+        "kubernetes", data, generate_kubernetes_manifest
+    )
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return result
+
+
+# The streaming variants send YAML as it is dumped instead of one JSON
+# document, which keeps memory flat for very large projects. They bypass the
+# generation cache.
+@app.post("/generate/docker-compose/stream")
+async def stream_docker_compose(request: Request) -> StreamingResponse:
+    data = _generation_data(await get_payload(request))
+    return StreamingResponse(
+        iter_docker_compose_yaml(data, compose_fragments), media_type="text/yaml"
+    )
+
+
+@app.post("/generate/kubernetes/stream")
+async def stream_kubernetes(request: Request) -> Response:
+    data = _generation_data(await get_payload(request))
+    manifests, error = await kubernetes_manifests(data)
+    if error and not manifests:
+        return JSONResponse(status_code=422, content={"code": "", "error": error})
+
+    headers = {}
+    if error:
+        # Headers are latin-1 and single-line; kompose warnings may be neither.
+        headers["X-Generation-Error"] = (
+            " ".join(error.split()).encode("ascii", "replace").decode("ascii")
+        )
+    return StreamingResponse(
+        iter_manifests_yaml(manifests), media_type="text/yaml", headers=headers
+    )
+
+
+@app.post("/generate/kubernetes/batch")
+async def generate_kubernetes_batch(request: Request) -> dict[str, dict[str, str]]:
     payload = await get_payload(request)
-    data = payload.get("data", {})
-    if not isinstance(data, dict):
+    variants = payload.get("variants")
+    if not isinstance(variants, dict) or not variants:
         raise HTTPException(
-            status_code=400, detail="Expected payload.data to be an object"
+            status_code=400, detail="Expected payload.variants to be an object"
+        )
+    if len(variants) > GENERATE_BATCH_MAX_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {GENERATE_BATCH_MAX_VARIANTS} variants per batch",
+        )
+    if not all(isinstance(data, dict) for data in variants.values()):
+        raise HTTPException(
+            status_code=400, detail="Expected every variant to be an object"
         )
 
-    return generate_kubernetes_manifest(data)
+    async def convert(data: dict[str, Any]) -> dict[str, str]:
+        try:
+            result, _ = await cached_generation(
+                "kubernetes", data, generate_kubernetes_manifest
+            )
+        except KomposeBusy:
+            return {"code": "", "error": "Too many Kubernetes conversions"}
+        return result
+
+    # Variants convert concurrently; kompose fallbacks run as separate
+    # processes, so they spread across cores up to the pool size.
+    results = await asyncio.gather(*(convert(data) for data in variants.values()))
+    return dict(zip(variants, results))
 
 
 @app.post("/auth/registration/", status_code=201)
-async def register(request: Request, db: Session = Depends(get_db)) -> Any:
+async def register(request: Request, db: Database = Depends(get_db)) -> Any:
     payload = await get_payload(request)
 
     username = str(payload.get("username") or "").strip()
@@ -385,32 +902,41 @@ async def register(request: Request, db: Session = Depends(get_db)) -> Any:
             content={"password2": "The two password fields didn't match."},
         )
 
-    if db.query(User).filter(User.username == username).first():
-        return JSONResponse(
-            status_code=400,
-            content={"username": "A user with that username already exists."},
+    # The unique constraints do the duplicate check; only a conflict costs a
+    # second query to tell which field clashed.
+    statement = (
+        postgresql.insert(User.__table__)
+        .values(
+            username=username,
+            email=email,
+            password_hash=await hash_password_async(password1),
         )
+        .on_conflict_do_nothing()
+        .returning(*User.__table__.columns)
+    )
 
-    if db.query(User).filter(User.email == email).first():
+    user = await db.run(_write_returning, statement)
+    if user is None:
+        username_taken = await db.run(
+            lambda session: session.query(User.id)
+            .filter(User.username == username)
+            .first()
+        )
+        if username_taken:
+            return JSONResponse(
+                status_code=400,
+                content={"username": "A user with that username already exists."},
+            )
         return JSONResponse(
             status_code=400,
             content={"email": "A user with that email already exists."},
         )
 
-    user = User(
-        username=username,
-        email=email,
-        password_hash=hash_password(password1),
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-
     return auth_success_payload(user)
 
 
 @app.post("/auth/login/")
-async def login(request: Request, db: Session = Depends(get_db)) -> Any:
+async def login(request: Request, db: Database = Depends(get_db)) -> Any:
     payload = await get_payload(request)
 
     username_or_email = str(payload.get("username") or "").strip()
@@ -422,15 +948,15 @@ async def login(request: Request, db: Session = Depends(get_db)) -> Any:
             content={"detail": "Username and password are required."},
         )
 
-    user = (
-        db.query(User)
+    user = await db.run(
+        lambda session: session.query(User)
         .filter(
             or_(User.username == username_or_email, User.email == username_or_email)
         )
         .first()
     )
 
-    if not user or not verify_password(password, user.password_hash):
+    if not user or not await verify_password_async(password, user.password_hash):
         return JSONResponse(
             status_code=400,
             content={"detail": "Unable to log in with provided credentials."},
@@ -446,7 +972,7 @@ def self(current_user: User = Depends(get_current_user)) -> dict[str, Any]:
 
 @app.post("/auth/token/refresh/")
 async def refresh_token(
-    request: Request, db: Session = Depends(get_db)
+    request: Request, db: Database = Depends(get_db)
 ) -> dict[str, str]:
     payload = await get_payload(request)
     refresh = payload.get("refresh")
@@ -462,14 +988,16 @@ async def refresh_token(
     if user_id is None:
         raise HTTPException(status_code=401, detail="Token is invalid or expired")
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await db.run(
+        lambda session: session.query(User).filter(User.id == int(user_id)).first()
+    )
     if not user:
         raise HTTPException(
             status_code=401,
             detail={"code": "user_not_found", "detail": "User not found"},
         )
 
-    return {"access": create_access_token(user.id)}
+    return {"access": create_access_token(user.id, user_token_claims(user))}
 
 
 @app.post("/auth/github/")
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import contextlib
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Generic, Hashable, TypeVar
+
+_V = TypeVar("_V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[_V]):
+    def __init__(self, max_entries: int, ttl: float | None = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, _V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: _V) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        return entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    # JSON values stored as one file per key, so several worker processes on
+    # the same host can share entries. Reads bump the file's mtime, and the
+    # least recently used files are pruned once the directory grows too big.
+
+    def __init__(self, directory: str, max_entries: int, prune_every: int = 64):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self._path(key)
+        try:
+            with path.open("r", encoding="utf-8") as file_handle:
+                value = json.load(file_handle)
+            os.utime(path)
+        except (OSError, ValueError):
+            return default
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as file_handle:
+                json.dump(value, file_handle)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+            return
+
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.json"):
+            with contextlib.suppress(OSError):
+                entries.append((path.stat().st_mtime, path))
+
+        entries.sort()
+        for _, path in entries[: max(0, len(entries) - self.max_entries)]:
+            with contextlib.suppress(OSError):
+                path.unlink()
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.json"):
+            with contextlib.suppress(OSError):
+                path.unlink()
@@ -1,32 +1,219 @@
 import os
-from typing import Generator
+import time
 
-from sqlalchemy import create_engine
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 
+from metrics import counter, gauge, histogram, record_request_statement
+from responses import dumps_str, loads
 
-def _default_database_url() -> str:
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# Serve requests through an asyncpg engine instead of psycopg2 in the
+# threadpool. The sync engine stays around for migrations and create_all.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "0") == "1"
+
+_T = TypeVar("_T")
+
+DB_POOL_CHECKOUT_WAIT_SECONDS = histogram(
+    "ctk_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the pool.",
+)
+DB_POOL_WAITING = gauge(
+    "ctk_db_pool_waiting",
+    "Connection checkouts currently waiting on the pool.",
+)
+DB_POOL_IN_USE = gauge(
+    "ctk_db_pool_in_use",
+    "Connections currently checked out of the pool.",
+)
+DB_STATEMENTS = counter(
+    "ctk_db_statements_total",
+    "SQL statements executed.",
+)
+DB_STATEMENT_SECONDS = histogram(
+    "ctk_db_statement_seconds",
+    "Time spent executing single SQL statements.",
+)
+
+
+def _database_credentials() -> str:
     db_host = os.getenv("POSTGRES_HOST", "postgres")
     db_port = os.getenv("POSTGRES_PORT", "5432")
     db_name = os.getenv("POSTGRES_DB", "postgres")
     db_user = os.getenv("POSTGRES_USER", "postgres")
     db_password = os.getenv("POSTGRES_PASSWORD", "postgres")
-    return (
-        f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-    )
+    return f"{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+
+def _default_database_url() -> str:
+    return f"postgresql+psycopg2://{_database_credentials()}"
+
+
+def _default_async_database_url() -> str:
+    return f"postgresql+asyncpg://{_database_credentials()}"
 
 
 DATABASE_URL = _default_database_url()
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _default_async_database_url()
+
+
+class _TimedCheckout:
+    # QueuePool._do_get blocks while the pool is exhausted, so timing it gives
+    # the checkout wait without touching the fast path.
+
+    def _do_get(self) -> Any:
+        started_at = time.perf_counter()
+        DB_POOL_WAITING.inc()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAITING.dec()
+            DB_POOL_CHECKOUT_WAIT_SECONDS.observe(time.perf_counter() - started_at)
+
+
+class _TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class _TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+pool_kwargs = {
+    "pool_pre_ping": True,
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_timeout": DB_POOL_TIMEOUT,
+}
+engine_kwargs = {
+    "json_serializer": dumps_str,
+    "json_deserializer": loads,
+}
+
+connect_args: dict[str, Any] = {}
+async_connect_args: dict[str, Any] = {}
+if DB_STATEMENT_TIMEOUT_MS:
+    connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    async_connect_args["server_settings"] = {
+        "statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)
+    }
+
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=_TimedQueuePool,
+    connect_args=connect_args,
+    **pool_kwargs,
+    **engine_kwargs,
+)
+# Objects outlive the unit of work that loaded them (responses are built after
+# the commit), so they are not expired on commit.
+SessionLocal = sessionmaker(
+    bind=engine, autoflush=False, autocommit=False, expire_on_commit=False
+)
+
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_ASYNC:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=_TimedAsyncQueuePool,
+        connect_args=async_connect_args,
+        **pool_kwargs,
+        **engine_kwargs,
+    )
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
 
-engine_kwargs = {"pool_pre_ping": True}
-engine = create_engine(DATABASE_URL, **engine_kwargs)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
+def _before_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    conn.info.setdefault("statement_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    started_at = conn.info["statement_started_at"].pop()
+    elapsed = time.perf_counter() - started_at
+    DB_STATEMENTS.inc()
+    DB_STATEMENT_SECONDS.observe(elapsed)
+    record_request_statement(elapsed)
+
+
+def _handle_error(context: Any) -> None:
+    # Failed statements never reach after_cursor_execute.
+    connection = context.connection
+    if connection is not None and connection.info.get("statement_started_at"):
+        connection.info["statement_started_at"].pop()
+
+
+def instrument_engine(target: Engine) -> None:
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
+
+
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+
+
+def _checked_out_connections() -> int:
+    pools = [engine.pool] + ([async_engine.pool] if async_engine else [])
+    return sum(pool.checkedout() for pool in pools if hasattr(pool, "checkedout"))
+
+
+DB_POOL_IN_USE.set_function(_checked_out_connections)
+
+
+class Database:
+    # Per-request handle. Handlers pass a function taking a sync Session to
+    # run(); it executes through AsyncSession.run_sync on the async engine or
+    # in the threadpool otherwise, so the event loop never blocks on the
+    # database and the query code is the same in both modes.
+
+    def __init__(self) -> None:
+        if AsyncSessionLocal is not None:
+            self._async_session: AsyncSession | None = AsyncSessionLocal()
+            self._session: Session | None = None
+        else:
+            self._async_session = None
+            self._session = SessionLocal()
+
+    async def run(self, function: Callable[..., _T], *args: Any) -> _T:
+        if self._async_session is not None:
+            return await self._async_session.run_sync(function, *args)
+        return await run_in_threadpool(function, self._session, *args)
+
+    async def close(self) -> None:
+        if self._async_session is not None:
+            await self._async_session.close()
+        else:
+            await run_in_threadpool(self._session.close)
+
+
+async def get_db() -> AsyncIterator[Database]:
+    db = Database()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
@@ -0,0 +1,81 @@
+import os
+import json
+import hashlib
+
+from typing import Any, Awaitable, Callable
+
+from cache import DiskCache, TTLCache
+from manifest_generation import GENERATOR_VERSION
+from metrics import counter
+
+
+# "memory" keeps results per process, "disk" shares them between the workers
+# of one host through GENERATION_CACHE_DIR, and "none" disables caching.
+GENERATION_CACHE_BACKEND = os.getenv("GENERATION_CACHE_BACKEND", "memory").lower()
+GENERATION_CACHE_ENTRIES = int(os.getenv("GENERATION_CACHE_ENTRIES", "1024"))
+GENERATION_CACHE_TTL = float(os.getenv("GENERATION_CACHE_TTL", "0")) or None
+GENERATION_CACHE_DIR = os.getenv("GENERATION_CACHE_DIR", "/tmp/ctk-generation-cache")
+
+GENERATION_CACHE_HITS = counter(
+    "ctk_generation_cache_hits_total",
+    "Generate requests answered from the generation cache.",
+)
+GENERATION_CACHE_MISSES = counter(
+    "ctk_generation_cache_misses_total",
+    "Generate requests that had to run a generator.",
+)
+
+
+def _build_backend() -> TTLCache[dict[str, str]] | DiskCache | None:
+    if GENERATION_CACHE_BACKEND == "none":
+        return None
+    if GENERATION_CACHE_BACKEND == "disk":
+        return DiskCache(GENERATION_CACHE_DIR, GENERATION_CACHE_ENTRIES)
+    return TTLCache(GENERATION_CACHE_ENTRIES, GENERATION_CACHE_TTL)
+
+
+_generation_cache = _build_backend()
+
+
+def generation_cache_key(kind: str, data: dict[str, Any]) -> str:
+    # Keys are not sorted: service order and the key order inside each
+    # service show up in the generated YAML, so reordered payloads must not
+    # share an entry.
+    serialized = json.dumps(
+        data,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    digest = hashlib.sha256()
+    digest.update(f"{kind}:{GENERATOR_VERSION}:".encode("utf-8"))
+    digest.update(serialized.encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def cached_generation(
+    kind: str,
+    data: dict[str, Any],
+    generate: Callable[[dict[str, Any]], Awaitable[dict[str, str]]],
+) -> tuple[dict[str, str], bool]:
+    if _generation_cache is None:
+        GENERATION_CACHE_MISSES.inc()
+        return await generate(data), False
+
+    key = generation_cache_key(kind, data)
+    result = _generation_cache.get(key)
+    if result is not None:
+        GENERATION_CACHE_HITS.inc()
+        return result, True
+
+    GENERATION_CACHE_MISSES.inc()
+    result = await generate(data)
+    # Failures such as a missing kompose binary are not worth remembering.
+    if not result.get("error"):
+        _generation_cache.set(key, result)
+    return result, False
+
+
+def clear_generation_cache() -> None:
+    if _generation_cache is not None:
+        _generation_cache.clear()
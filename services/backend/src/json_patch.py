@@ -0,0 +1,129 @@
+import copy
+
+from typing import Any
+
+
+# RFC 7396 (JSON Merge Patch) and RFC 6902 (JSON Patch), applied in place to
+# documents freshly loaded for the request.
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def apply_merge_patch(target: Any, patch: Any) -> Any:
+    if not isinstance(patch, dict):
+        return patch
+    if not isinstance(target, dict):
+        target = {}
+
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        else:
+            target[key] = apply_merge_patch(target.get(key), value)
+    return target
+
+
+def _pointer_tokens(pointer: Any) -> list[str]:
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    if not pointer:
+        return []
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    ]
+
+
+def _array_index(container: list[Any], token: str, allow_end: bool) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+
+    index = int(token)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise JsonPatchError(f"Array index out of range: {token}")
+    return index
+
+
+def _resolve(document: Any, tokens: list[str]) -> Any:
+    for token in tokens:
+        if isinstance(document, dict):
+            if token not in document:
+                raise JsonPatchError(f"Path does not exist: /{'/'.join(tokens)}")
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[_array_index(document, token, False)]
+        else:
+            raise JsonPatchError(f"Path does not exist: /{'/'.join(tokens)}")
+    return document
+
+
+def _add(document: Any, tokens: list[str], value: Any) -> Any:
+    if not tokens:
+        return value
+
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, tokens[-1], True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to a scalar at /{'/'.join(tokens)}")
+    return document
+
+
+def _remove(document: Any, tokens: list[str]) -> tuple[Any, Any]:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+
+    parent = _resolve(document, tokens[:-1])
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise JsonPatchError(f"Path does not exist: /{'/'.join(tokens)}")
+        return document, parent.pop(tokens[-1])
+    if isinstance(parent, list):
+        return document, parent.pop(_array_index(parent, tokens[-1], False))
+    raise JsonPatchError(f"Path does not exist: /{'/'.join(tokens)}")
+
+
+def apply_json_patch(document: Any, operations: Any) -> Any:
+    if not isinstance(operations, list):
+        raise JsonPatchError("A JSON Patch must be an array of operations")
+
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise JsonPatchError("Every JSON Patch operation must be an object")
+
+        op = operation.get("op")
+        tokens = _pointer_tokens(operation.get("path"))
+
+        if op in {"add", "replace", "test"} and "value" not in operation:
+            raise JsonPatchError(f"Operation {op!r} requires a value")
+
+        if op == "add":
+            document = _add(document, tokens, operation["value"])
+        elif op == "remove":
+            document, _ = _remove(document, tokens)
+        elif op == "replace":
+            if tokens:
+                document, _ = _remove(document, tokens)
+            document = _add(document, tokens, operation["value"])
+        elif op in {"move", "copy"}:
+            source = _pointer_tokens(operation.get("from"))
+            if op == "move":
+                if tokens[: len(source)] == source and tokens != source:
+                    raise JsonPatchError("Cannot move a value into its own child")
+                document, value = _remove(document, source)
+            else:
+                value = copy.deepcopy(_resolve(document, source))
+            document = _add(document, tokens, value)
+        elif op == "test":
+            if _resolve(document, tokens) != operation["value"]:
+                raise JsonPatchError(f"Test failed at {operation.get('path')}")
+        else:
+            raise JsonPatchError(f"Unsupported JSON Patch operation: {op!r}")
+
+    return document
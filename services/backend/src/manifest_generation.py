@@ -1,55 +1,130 @@
 import io
 import os
 import re
-import random
+import json
+import time
+import shlex
+import atexit
 import shutil
-import string
+import signal
+import asyncio
+import hashlib
+import tempfile
+import threading
 import contextlib
-import subprocess as sp
 
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Callable, Iterator
 
 from ruamel.yaml import YAML
 from ruamel.yaml.scalarstring import DoubleQuotedScalarString
 
-
-def _sequence_indent_four(text: str) -> str:
-    result = ""
-    first_indent = True
-
+from cache import TTLCache
+from metrics import counter, gauge, histogram
+
+
+# Part of the generation cache key. Bump it whenever a change here alters the
+# generated output for an existing payload.
+GENERATOR_VERSION = "3"
+
+# Opt-in: the in-process translator is only known to match kompose for the
+# fixtures under tests/fixtures/kubernetes whose kompose output is checked in.
+KUBERNETES_NATIVE_TRANSLATOR = os.getenv("KUBERNETES_NATIVE_TRANSLATOR", "0") == "1"
+
+COMPOSE_FRAGMENT_CACHE_ENTRIES = int(
+    os.getenv("COMPOSE_FRAGMENT_CACHE_ENTRIES", "8192")
+)
+KOMPOSE_CONCURRENCY = int(os.getenv("KOMPOSE_CONCURRENCY", str(os.cpu_count() or 2)))
+KOMPOSE_MAX_QUEUE = int(os.getenv("KOMPOSE_MAX_QUEUE", "32"))
+KOMPOSE_TIMEOUT = float(os.getenv("KOMPOSE_TIMEOUT", "30"))
+# kompose only needs a scratch directory for its input, so keep it in memory
+# when the host has a tmpfs.
+KOMPOSE_WORKDIR_ROOT = os.getenv("KOMPOSE_WORKDIR_ROOT") or (
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+
+KOMPOSE_QUEUE_WAIT_SECONDS = histogram(
+    "ctk_kompose_queue_wait_seconds",
+    "Time kompose conversions spend waiting for a free slot.",
+)
+KOMPOSE_CONVERSION_SECONDS = histogram(
+    "ctk_kompose_conversion_seconds",
+    "Wall time of kompose processes.",
+)
+KOMPOSE_REJECTED = counter(
+    "ctk_kompose_rejected_total",
+    "Kompose conversions rejected because the queue was full.",
+)
+KOMPOSE_TIMEOUTS = counter(
+    "ctk_kompose_timeouts_total",
+    "Kompose processes killed after exceeding KOMPOSE_TIMEOUT.",
+)
+KOMPOSE_WAITING = gauge(
+    "ctk_kompose_waiting",
+    "Kompose conversions waiting for a free slot.",
+)
+KUBERNETES_NATIVE_TRANSLATIONS = counter(
+    "ctk_kubernetes_native_translations_total",
+    "Kubernetes manifests produced without running kompose.",
+)
+KUBERNETES_KOMPOSE_FALLBACKS = counter(
+    "ctk_kubernetes_kompose_fallbacks_total",
+    "Kubernetes manifests that needed kompose for unsupported compose keys.",
+)
+KOMPOSE_RUNNING = gauge(
+    "ctk_kompose_running",
+    "Kompose processes currently running.",
+)
+COMPOSE_FRAGMENT_HITS = counter(
+    "ctk_compose_fragment_cache_hits_total",
+    "Compose services, networks and volumes reused from the fragment cache.",
+)
+COMPOSE_FRAGMENT_MISSES = counter(
+    "ctk_compose_fragment_cache_misses_total",
+    "Compose services, networks and volumes that had to be dumped.",
+)
+YAML_DUMP_SECONDS = histogram(
+    "ctk_yaml_dump_seconds",
+    "Time spent dumping generated YAML.",
+    labelnames=("output",),
+)
+_COMPOSE_DUMP_SECONDS = YAML_DUMP_SECONDS.labels("compose")
+_FRAGMENT_DUMP_SECONDS = YAML_DUMP_SECONDS.labels("compose_fragment")
+_MANIFEST_DUMP_SECONDS = YAML_DUMP_SECONDS.labels("manifests")
+
+
+def _indented_line_starts(text: str, indent: int) -> list[int]:
+    # Offsets of the lines indented by exactly indent characters, measured
+    # as len(line) - len(line.lstrip()).
+    starts: list[int] = []
+    position = 0
     for line in text.splitlines(True):
-        stripped = line.lstrip()
-        indent = len(line) - len(stripped)
+        if len(line) - len(line.lstrip()) == indent:
+            starts.append(position)
+        position += len(line)
+    return starts
 
-        if indent == 2 and not first_indent:
-            result += "\n"
 
-        result += line
+def _separate(text: str, starts: list[int]) -> str:
+    # Inserts a blank line before each of the given line offsets.
+    if not starts:
+        return text
 
-        if indent == 2 and first_indent:
-            first_indent = False
+    pieces: list[str] = []
+    previous = 0
+    for start in starts:
+        pieces.append(text[previous:start])
+        previous = start
+    pieces.append(text[previous:])
+    return "\n".join(pieces)
 
-    return result
-
-
-def _sequence_indent_one(text: str) -> str:
-    result = ""
-    first_indent = True
 
-    for line in text.splitlines(True):
-        stripped = line.lstrip()
-        indent = len(line) - len(stripped)
-
-        if indent == 0 and not first_indent:
-            result += "\n"
-
-        result += line
+def _sequence_indent_four(text: str) -> str:
+    return _separate(text, _indented_line_starts(text, 2)[1:])
 
-        if indent == 0 and first_indent:
-            first_indent = False
 
-    return result
+def _sequence_indent_one(text: str) -> str:
+    return _separate(text, _indented_line_starts(text, 0)[1:])
 
 
 def _parse_version(version: str) -> int | float:
@@ -68,53 +143,257 @@ def _is_latest_compose_spec(version: str) -> bool:
     }
 
 
-def generate_docker_compose_yaml(payload: dict[str, Any]) -> str:
-    version = str(payload.get("version", "latest")).strip()
-    services = payload.get("services")
-    volumes = payload.get("volumes")
-    networks = payload.get("networks")
-
-    output = io.StringIO()
+# Service keys the in-process translator understands. Everything else, such as
+# healthchecks, networks or bind mounts, is left to kompose.
+_NATIVE_SERVICE_KEYS = {
+    "command",
+    "depends_on",
+    "deploy",
+    "entrypoint",
+    "environment",
+    "image",
+    "labels",
+    "ports",
+    "restart",
+    "volumes",
+}
+_KOMPOSE_OMITTED_KEYS = {"env_file", "build", "secrets", "profiles"}
+_KUBERNETES_NAME = re.compile(r"[a-z0-9]([-a-z0-9]*[a-z0-9])?")
+_EMPTY: tuple[Any, ...] = (None, "", [], {})
+
+
+def _new_compose_emitter() -> YAML:
     yaml = YAML()
     yaml.indent(mapping=2, sequence=4, offset=2)
     yaml.preserve_quotes = True
     yaml.explicit_start = True
-    wrote_document = False
+    return yaml
+
+
+def _new_compose_fragment_emitter() -> YAML:
+    yaml = _new_compose_emitter()
+    yaml.explicit_start = False
+    return yaml
 
-    def dump_chunk(data: dict[str, Any], transform: Any = None) -> None:
-        nonlocal wrote_document
-        yaml.explicit_start = not wrote_document
-        if transform:
-            yaml.dump(data, output, transform=transform)
-        else:
-            yaml.dump(data, output)
-        wrote_document = True
+
+def _new_manifest_emitter() -> YAML:
+    yaml = YAML()
+    yaml.indent(mapping=2, sequence=4, offset=2)
+    yaml.explicit_start = True
+    return yaml
+
+
+_emitters = threading.local()
+
+
+def _emitter(name: str, factory: Callable[[], YAML]) -> YAML:
+    # ruamel YAML instances are not thread-safe, but they can be reused for
+    # sequential dumps, so every thread keeps its own configured instance.
+    # Generators must not hold one across a yield.
+    yaml = getattr(_emitters, name, None)
+    if yaml is None:
+        yaml = factory()
+        setattr(_emitters, name, yaml)
+    return yaml
+
+
+def _compose_sections(text: str) -> str:
+    # Blank line between top-level sections and between services, matching
+    # the layout of dumping each section on its own.
+    sections = []
+    for start in _indented_line_starts(text, 0):
+        end = text.find("\n", start)
+        if text[start : end if end != -1 else len(text)].rstrip() != "---":
+            sections.append(start)
+
+    services: list[int] = []
+    service_lines = _indented_line_starts(text, 2)
+    for index, start in enumerate(sections):
+        if text.startswith("services:", start):
+            end = sections[index + 1] if index + 1 < len(sections) else len(text)
+            services.extend(
+                position for position in service_lines if start < position < end
+            )
+
+    starts = sorted(sections[1:] + services[1:])
+    return _separate(text, starts)
+
+
+def generate_docker_compose_yaml(payload: dict[str, Any]) -> str:
+    version = str(payload.get("version", "latest")).strip()
+    services = payload.get("services")
+    volumes = payload.get("volumes")
+    networks = payload.get("networks")
 
     latest_compose_spec = _is_latest_compose_spec(version)
-    major_version = 3
+    document: dict[str, Any] = {}
 
     if not latest_compose_spec:
         specified_version = _parse_version(version)
-        major_version = int(specified_version)
-        dump_chunk({"version": DoubleQuotedScalarString(str(specified_version))})
-        output.write("\n")
+        if int(specified_version) not in {2, 3}:
+            return _generate_legacy_docker_compose_yaml(
+                specified_version, services, volumes
+            )
+        document["version"] = DoubleQuotedScalarString(str(specified_version))
 
     if services:
-        if latest_compose_spec or major_version in {2, 3}:
-            dump_chunk({"services": services}, transform=_sequence_indent_four)
-        elif major_version == 1:
-            dump_chunk(services, transform=_sequence_indent_one)
-        output.write("\n")
+        document["services"] = services
+    if networks:
+        document["networks"] = networks
+    if volumes:
+        document["volumes"] = volumes
+
+    if not document:
+        return ""
+
+    output = io.StringIO()
+    yaml = _emitter("compose", _new_compose_emitter)
+    with _COMPOSE_DUMP_SECONDS.time():
+        yaml.dump(document, output, transform=_compose_sections)
 
-    if (latest_compose_spec or major_version in {2, 3}) and networks:
-        dump_chunk({"networks": networks})
+    # Every section but volumes used to be followed by a blank line.
+    if "volumes" not in document:
         output.write("\n")
 
-    if volumes:
-        dump_chunk({"volumes": volumes})
+    return output.getvalue()
 
-    output.seek(0)
-    return output.read()
+
+def _render_section_entry(section: str, name: Any, value: Any) -> str:
+    # Dumped under its own section key, which is then cut off, so the entry
+    # is indented exactly as in the full document.
+    separate = _sequence_indent_four if section == "services" else _sequence_indent_one
+    output = io.StringIO()
+    yaml = _emitter("compose_fragment", _new_compose_fragment_emitter)
+    with _FRAGMENT_DUMP_SECONDS.time():
+        yaml.dump(
+            {section: {name: value}},
+            output,
+            transform=lambda text: separate(text[len(section) + 2 :]),
+        )
+    return output.getvalue()
+
+
+class ComposeFragmentCache:
+    # Rendered YAML of single services, networks and volumes keyed by their
+    # content. Regenerating a project after an edit only dumps the entries
+    # that changed; everything else is stitched back in from here.
+
+    def __init__(self, max_entries: int) -> None:
+        self._fragments: TTLCache[str] = TTLCache(max_entries)
+
+    def render(self, section: str, name: Any, value: Any) -> str:
+        # Same encoding as the generation cache key: orjson writes NaN as
+        # null and rejects integers wider than 64 bits.
+        serialized = json.dumps(
+            [section, name, value],
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+        key = hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).digest()
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            COMPOSE_FRAGMENT_HITS.inc()
+            return fragment
+
+        COMPOSE_FRAGMENT_MISSES.inc()
+        fragment = _render_section_entry(section, name, value)
+        self._fragments.set(key, fragment)
+        return fragment
+
+    def clear(self) -> None:
+        self._fragments.clear()
+
+
+compose_fragments = ComposeFragmentCache(COMPOSE_FRAGMENT_CACHE_ENTRIES)
+
+
+def iter_docker_compose_yaml(
+    payload: dict[str, Any], fragments: ComposeFragmentCache | None = None
+) -> Iterator[str]:
+    # Yields the text of generate_docker_compose_yaml entry by entry, so large
+    # projects never exist as one string. With a fragment cache, entries that
+    # were rendered before are not dumped again.
+    version = str(payload.get("version", "latest")).strip()
+    services = payload.get("services")
+    volumes = payload.get("volumes")
+    networks = payload.get("networks")
+
+    if not _is_latest_compose_spec(version):
+        specified_version = _parse_version(version)
+        if int(specified_version) not in {2, 3}:
+            yield _generate_legacy_docker_compose_yaml(
+                specified_version, services, volumes
+            )
+            return
+
+    sections = [
+        (key, value)
+        for key, value in (
+            ("services", services),
+            ("networks", networks),
+            ("volumes", volumes),
+        )
+        if value
+    ]
+    if not sections and _is_latest_compose_spec(version):
+        return
+
+    render = fragments.render if fragments is not None else _render_section_entry
+    yield "---\n"
+    if not _is_latest_compose_spec(version):
+        output = io.StringIO()
+        yaml = _emitter("compose_fragment", _new_compose_fragment_emitter)
+        yaml.dump({"version": DoubleQuotedScalarString(str(specified_version))}, output)
+        yield output.getvalue()
+        if sections:
+            yield "\n"
+
+    for index, (key, value) in enumerate(sections):
+        if index:
+            yield "\n"
+        yield f"{key}:\n"
+        for entry_index, (name, entry) in enumerate(value.items()):
+            # Services are separated by blank lines, other entries are not.
+            if entry_index and key == "services":
+                yield "\n"
+            yield render(key, name, entry)
+
+    if "volumes" not in dict(sections):
+        yield "\n"
+
+
+def render_docker_compose_yaml(
+    payload: dict[str, Any], fragments: ComposeFragmentCache | None = None
+) -> str:
+    return "".join(iter_docker_compose_yaml(payload, fragments))
+
+
+def _generate_legacy_docker_compose_yaml(
+    specified_version: int | float,
+    services: Any,
+    volumes: Any,
+) -> str:
+    output = io.StringIO()
+    yaml = _emitter("compose", _new_compose_emitter)
+    major_version = int(specified_version)
+
+    yaml.dump({"version": DoubleQuotedScalarString(str(specified_version))}, output)
+    output.write("\n")
+
+    yaml.explicit_start = False
+    try:
+        if services:
+            if major_version == 1:
+                yaml.dump(services, output, transform=_sequence_indent_one)
+            output.write("\n")
+
+        if volumes:
+            yaml.dump({"volumes": volumes}, output)
+    finally:
+        yaml.explicit_start = True
+
+    return output.getvalue()
 
 
 def clean_dict(data: Any, omit: set[str] | None = None) -> Any:
@@ -132,89 +411,514 @@ def clean_dict(data: Any, omit: set[str] | None = None) -> Any:
     return data
 
 
-def _get_random_string(length: int) -> str:
-    letters = string.ascii_lowercase
-    return "".join(random.choice(letters) for _ in range(length))
-
-
-def _read_dir(path: str) -> list[str]:
-    return [
-        file_name
-        for file_name in os.listdir(path)
-        if os.path.isfile(os.path.join(path, file_name))
+class _UnsupportedByTranslator(Exception):
+    pass
+
+
+def _require(condition: bool) -> None:
+    if not condition:
+        raise _UnsupportedByTranslator()
+
+
+def _kompose_labels(name: str) -> dict[str, str]:
+    # A fresh dict per use, shared ones would be dumped as YAML anchors.
+    return {"io.kompose.service": name}
+
+
+def _command_list(value: Any) -> list[str]:
+    if isinstance(value, str):
+        try:
+            return shlex.split(value)
+        except ValueError:
+            # Unbalanced quotes; let kompose report it.
+            raise _UnsupportedByTranslator() from None
+    _require(isinstance(value, list))
+    return [str(item) for item in value]
+
+
+def _translate_env(value: Any) -> list[dict[str, str]]:
+    variables: dict[str, str] = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if item is None:
+                item = ""
+            elif isinstance(item, bool):
+                item = "true" if item else "false"
+            variables[str(key)] = str(item)
+    else:
+        _require(isinstance(value, list))
+        for item in value:
+            key, _, item_value = str(item).partition("=")
+            variables[key] = item_value
+
+    return [{"name": key, "value": variables[key]} for key in sorted(variables)]
+
+
+def _translate_port(value: Any) -> tuple[int, int, str]:
+    # Returns (published, target, protocol) for the short and long syntax.
+    if isinstance(value, dict):
+        _require(set(value) <= {"target", "published", "protocol"})
+        target = value.get("target")
+        published = value.get("published", target)
+        protocol = str(value.get("protocol", "tcp"))
+    else:
+        spec, _, protocol = str(value).partition("/")
+        parts = spec.split(":")
+        _require(1 <= len(parts) <= 3)
+        target = parts[-1]
+        published = parts[-2] if len(parts) > 1 and parts[-2] else target
+
+    _require(str(target).isdigit() and str(published).isdigit())
+    protocol = (protocol or "tcp").upper()
+    _require(protocol in {"TCP", "UDP"})
+    return int(published), int(target), protocol
+
+
+def _translate_volume(
+    value: Any, named_volumes: dict[str, Any]
+) -> tuple[str, str, bool]:
+    # Only named volumes map onto claims; bind mounts and anonymous volumes
+    # need kompose's host path handling.
+    if isinstance(value, dict):
+        _require(set(value) <= {"type", "source", "target", "read_only"})
+        _require(value.get("type", "volume") == "volume")
+        source = str(value.get("source", ""))
+        target = str(value.get("target", ""))
+        read_only = bool(value.get("read_only", False))
+    else:
+        parts = str(value).split(":")
+        _require(len(parts) in {2, 3})
+        source, target = parts[0], parts[1]
+        mode = parts[2] if len(parts) == 3 else "rw"
+        _require(mode in {"ro", "rw"})
+        read_only = mode == "ro"
+
+    _require(source in named_volumes and target.startswith("/"))
+    return _kubernetes_name(source), target, read_only
+
+
+def _kubernetes_name(name: Any) -> str:
+    name = str(name)
+    _require(_KUBERNETES_NAME.fullmatch(name) is not None)
+    return name
+
+
+def _has_kompose_labels(labels: Any) -> bool:
+    # kompose.* labels change what kompose generates (service type, exposed
+    # ingress, volume sizes and so on). Other labels only end up in the
+    # annotations, which are stripped from the output anyway.
+    if isinstance(labels, dict):
+        keys = [str(key) for key in labels]
+    else:
+        _require(isinstance(labels, list))
+        keys = [str(label).partition("=")[0] for label in labels]
+    return any(key.startswith("kompose.") for key in keys)
+
+
+def _translate_service(
+    service_name: str, service: Any, named_volumes: dict[str, Any]
+) -> dict[str, dict[str, Any]]:
+    _require(isinstance(service, dict))
+    service = {key: value for key, value in service.items() if value not in _EMPTY}
+    _require(set(service) <= _NATIVE_SERVICE_KEYS)
+    _require(isinstance(service.get("image"), str))
+    _require(service.get("restart", "always") in {"always", "unless-stopped"})
+    _require(not _has_kompose_labels(service.get("labels", {})))
+
+    name = _kubernetes_name(service_name)
+    container: dict[str, Any] = {}
+    manifests: dict[str, dict[str, Any]] = {}
+
+    replicas = 1
+    deploy = service.get("deploy", {})
+    _require(isinstance(deploy, dict) and set(deploy) <= {"replicas"})
+    if "replicas" in deploy:
+        _require(str(deploy["replicas"]).isdigit())
+        replicas = int(deploy["replicas"])
+
+    if "command" in service:
+        container["args"] = _command_list(service["command"])
+    if "entrypoint" in service:
+        container["command"] = _command_list(service["entrypoint"])
+    if "environment" in service:
+        container["env"] = _translate_env(service["environment"])
+
+    container["image"] = service["image"]
+    container["name"] = name
+
+    ports = [_translate_port(port) for port in service.get("ports", [])]
+    if ports:
+        container["ports"] = []
+        for _, target, protocol in ports:
+            container_port: dict[str, Any] = {"containerPort": target}
+            if protocol != "TCP":
+                container_port["protocol"] = protocol
+            container["ports"].append(container_port)
+
+        service_ports = []
+        for published, target, protocol in ports:
+            service_port: dict[str, Any] = {
+                "name": str(published),
+                "port": published,
+                "targetPort": target,
+            }
+            if protocol != "TCP":
+                service_port["protocol"] = protocol
+            service_ports.append(service_port)
+
+        manifests[f"{name}-service"] = {
+            "apiVersion": "v1",
+            "kind": "Service",
+            "metadata": {"labels": _kompose_labels(name), "name": name},
+            "spec": {"ports": service_ports, "selector": _kompose_labels(name)},
+        }
+
+    claims = [
+        _translate_volume(volume, named_volumes)
+        for volume in service.get("volumes", [])
     ]
+    pod_volumes: list[dict[str, Any]] = []
+    if claims:
+        container["volumeMounts"] = []
+        for claim_name, mount_path, read_only in claims:
+            mount: dict[str, Any] = {"mountPath": mount_path, "name": claim_name}
+            if read_only:
+                mount["readOnly"] = True
+            container["volumeMounts"].append(mount)
+
+            if all(volume["name"] != claim_name for volume in pod_volumes):
+                pod_volumes.append(
+                    {
+                        "name": claim_name,
+                        "persistentVolumeClaim": {"claimName": claim_name},
+                    }
+                )
+                manifests[f"{claim_name}-persistentvolumeclaim"] = {
+                    "apiVersion": "v1",
+                    "kind": "PersistentVolumeClaim",
+                    "metadata": {
+                        "labels": _kompose_labels(claim_name),
+                        "name": claim_name,
+                    },
+                    "spec": {
+                        "accessModes": ["ReadWriteOnce"],
+                        "resources": {"requests": {"storage": "100Mi"}},
+                    },
+                }
+
+    pod_spec: dict[str, Any] = {"containers": [container], "restartPolicy": "Always"}
+    if pod_volumes:
+        pod_spec["volumes"] = pod_volumes
+
+    manifests[f"{name}-deployment"] = {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"labels": _kompose_labels(name), "name": name},
+        "spec": {
+            "replicas": replicas,
+            "selector": {"matchLabels": _kompose_labels(name)},
+            "strategy": {"type": "Recreate"} if pod_volumes else {},
+            "template": {
+                "metadata": {"labels": _kompose_labels(name)},
+                "spec": pod_spec,
+            },
+        },
+    }
+    return manifests
 
 
-def generate_kubernetes_manifest(payload: dict[str, Any]) -> dict[str, str]:
-    response = {"code": "", "error": ""}
-    workdir = Path(f"/tmp/{_get_random_string(8)}")
-    workdir.mkdir(exist_ok=True)
-
-    compose_payload = clean_dict(
-        payload,
-        omit={"env_file", "build", "secrets", "profiles"},
-    )
+def translate_kubernetes_manifests(payload: dict[str, Any]) -> list[Any] | None:
+    # Builds the Deployments, Services and claims kompose would produce for
+    # the common subset of compose. Returns None when the payload uses
+    # anything else, in which case the caller falls back to kompose.
+    payload = clean_dict(payload, omit=_KOMPOSE_OMITTED_KEYS)
+    try:
+        _require(set(payload) <= {"version", "services", "volumes", "networks"})
+        _require(not payload.get("networks"))
+
+        version = str(payload.get("version", "latest")).strip()
+        _require(
+            _is_latest_compose_spec(version)
+            or version in {"2", "2.0", "3", "3.0"}
+            or version.startswith(("2.", "3."))
+        )
+
+        named_volumes = payload.get("volumes") or {}
+        _require(isinstance(named_volumes, dict))
+        _require(all(not options for options in named_volumes.values()))
+
+        services = payload.get("services") or {}
+        _require(isinstance(services, dict))
+
+        manifests: dict[str, dict[str, Any]] = {}
+        for service_name, service in services.items():
+            manifests.update(_translate_service(service_name, service, named_volumes))
+    except _UnsupportedByTranslator:
+        return None
+
+    return [manifests[file_name] for file_name in sorted(manifests)]
+
+
+class KomposeBusy(Exception):
+    pass
+
+
+def _kompose_error(stderr: bytes) -> str:
+    text = stderr.decode("utf-8")
+    parts = text.split(" ")
+
+    if parts:
+        parts.pop()
+    if parts:
+        parts.pop(0)
+
+    cleaned_parts = [re.sub(r"\[.*?;.*?m", "", piece) for piece in parts if piece]
+    return " ".join(cleaned_parts)
+
+
+class WorkdirPool:
+    # Scratch directories for kompose. They live under one private parent made
+    # with tempfile, preferably on tmpfs, and are emptied and reused instead
+    # of being created and removed for every conversion.
+
+    def __init__(self, root: str, size: int) -> None:
+        self.root = root
+        self.size = size
+        self._parent: Path | None = None
+        self._idle: list[Path] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Path:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            if self._parent is None:
+                self._parent = Path(
+                    tempfile.mkdtemp(prefix="ctk-kompose-", dir=self.root)
+                )
+            parent = self._parent
+        return Path(tempfile.mkdtemp(dir=parent))
+
+    def prefill(self) -> None:
+        workdirs = [self.acquire() for _ in range(self.size - len(self._idle))]
+        for workdir in workdirs:
+            self.release(workdir)
+
+    def release(self, workdir: Path) -> None:
+        try:
+            with os.scandir(workdir) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.unlink(entry.path)
+        except OSError:
+            shutil.rmtree(workdir, ignore_errors=True)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(workdir)
+                return
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def close(self) -> None:
+        with self._lock:
+            parent, self._parent = self._parent, None
+            self._idle.clear()
+        if parent is not None:
+            shutil.rmtree(parent, ignore_errors=True)
+
+
+def _write_kompose_input(workdir: Path, payload: dict[str, Any]) -> None:
+    compose_payload = clean_dict(payload, omit=_KOMPOSE_OMITTED_KEYS)
     docker_compose_code = generate_docker_compose_yaml(compose_payload)
+    (workdir / "docker-compose.yaml").write_text(docker_compose_code)
 
-    compose_path = workdir / "docker-compose.yaml"
-    compose_path.write_text(docker_compose_code)
-
-    if not shutil.which("kompose"):
-        response["error"] = "kompose is not installed in the backend container"
-        shutil.rmtree(workdir)
-        return response
-
-    process = sp.Popen(
-        [
-            "kompose",
-            "--suppress-warnings",
-            "--file",
-            str(compose_path),
-            "convert",
-        ],
-        cwd=str(workdir),
-        stdout=sp.PIPE,
-        stderr=sp.PIPE,
-    )
-    _, stderr = process.communicate()
-
-    if stderr:
-        text = stderr.decode("utf-8")
-        parts = text.split(" ")
-
-        if parts:
-            parts.pop()
-        if parts:
-            parts.pop(0)
 
-        cleaned_parts = [re.sub(r"\[.*?;.*?m", "", piece) for piece in parts if piece]
-        response["error"] = " ".join(cleaned_parts)
+def _strip_annotations(manifest: Any) -> None:
+    with contextlib.suppress(KeyError, TypeError):
+        del manifest["metadata"]["annotations"]
+    with contextlib.suppress(KeyError, TypeError):
+        del manifest["spec"]["template"]["metadata"]["annotations"]
 
-    workdir_files = _read_dir(str(workdir))
 
-    if "docker-compose.yaml" in workdir_files:
-        workdir_files.remove("docker-compose.yaml")
-
-    for index, file_name in enumerate(workdir_files):
-        with (workdir / file_name).open("r") as file_handle:
-            yaml = YAML()
-            yaml.indent(mapping=2, sequence=4, offset=2)
-            yaml.explicit_start = True
-            data = yaml.load(file_handle)
-
-            with contextlib.suppress(KeyError, TypeError):
-                del data["metadata"]["annotations"]
-            with contextlib.suppress(KeyError, TypeError):
-                del data["spec"]["template"]["metadata"]["annotations"]
-
-            buffer = io.BytesIO()
-
-            yaml.dump(data, buffer)
+def _manifest_separators(text: str) -> str:
+    # A blank line before every document but the first.
+    starts = [
+        start
+        for start in _indented_line_starts(text, 0)
+        if text.startswith("---\n", start)
+    ]
+    return _separate(text, starts[1:])
 
-            response["code"] += buffer.getvalue().decode("utf-8")
 
-            if index != len(workdir_files) - 1:
-                response["code"] += "\n"
+def dump_manifests(manifests: list[Any]) -> str:
+    if not manifests:
+        return ""
 
-    shutil.rmtree(workdir)
-    return response
+    output = io.StringIO()
+    yaml = _emitter("manifest", _new_manifest_emitter)
+    with _MANIFEST_DUMP_SECONDS.time():
+        yaml.dump_all(manifests, output, transform=_manifest_separators)
+    return output.getvalue()
+
+
+def iter_manifests_yaml(manifests: list[Any]) -> Iterator[str]:
+    # Same text as dump_manifests, one document at a time. The emitter is
+    # looked up per document: StreamingResponse resumes the generator on any
+    # threadpool thread, so an instance held across yields would be shared.
+    for index, manifest in enumerate(manifests):
+        output = io.StringIO()
+        if index:
+            output.write("\n")
+        yaml = _emitter("manifest", _new_manifest_emitter)
+        yaml.dump(manifest, output)
+        yield output.getvalue()
+
+
+def _load_kompose_output(stdout: bytes) -> list[Any]:
+    # kompose --stdout prints one document, a List wrapping every object.
+    yaml = _emitter("manifest", _new_manifest_emitter)
+    manifests = []
+    for document in yaml.load_all(stdout):
+        if document is None:
+            continue
+        if document.get("kind") == "List":
+            manifests.extend(document.get("items") or [])
+        else:
+            manifests.append(document)
+
+    for manifest in manifests:
+        _strip_annotations(manifest)
+    return manifests
+
+
+def _kill_process_group(process: asyncio.subprocess.Process) -> None:
+    # kompose runs in its own session so anything it spawned dies with it.
+    with contextlib.suppress(ProcessLookupError):
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+class KomposePool:
+    # Warm slots for kompose conversions. The binary is resolved and the
+    # workdirs are created once, the semaphore bounds how many processes run
+    # at once and callers beyond max_queue waiting for a slot are turned away.
+
+    def __init__(
+        self, size: int, max_queue: int, timeout: float, workdir_root: str
+    ) -> None:
+        self.size = size
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.workdirs = WorkdirPool(workdir_root, size)
+        self.waiting = 0
+        self._binary: str | None = None
+        self._binary_resolved = False
+        self._semaphore = asyncio.Semaphore(size)
+
+    @property
+    def binary(self) -> str | None:
+        if not self._binary_resolved:
+            self._binary = shutil.which("kompose")
+            self._binary_resolved = True
+        return self._binary
+
+    def warm(self) -> None:
+        if self.binary is not None:
+            self.workdirs.prefill()
+
+    def close(self) -> None:
+        self.workdirs.close()
+
+    @contextlib.asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        if self.waiting >= self.max_queue:
+            KOMPOSE_REJECTED.inc()
+            raise KomposeBusy()
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        KOMPOSE_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+
+        try:
+            with KOMPOSE_RUNNING.track_inprogress():
+                yield
+        finally:
+            self._semaphore.release()
+
+    async def _run(self, binary: str, workdir: Path) -> tuple[bytes, bytes, bool]:
+        process = await asyncio.create_subprocess_exec(
+            binary,
+            "--suppress-warnings",
+            "--file",
+            str(workdir / "docker-compose.yaml"),
+            "convert",
+            "--stdout",
+            cwd=str(workdir),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            _kill_process_group(process)
+            await process.wait()
+            return b"", b"", True
+        except asyncio.CancelledError:
+            _kill_process_group(process)
+            raise
+
+        return stdout, stderr, False
+
+    async def convert(self, payload: dict[str, Any]) -> tuple[list[Any], str]:
+        binary = self.binary
+        if binary is None:
+            return [], "kompose is not installed in the backend container"
+
+        async with self._slot():
+            workdir = await asyncio.to_thread(self.workdirs.acquire)
+            try:
+                await asyncio.to_thread(_write_kompose_input, workdir, payload)
+                with KOMPOSE_CONVERSION_SECONDS.time():
+                    stdout, stderr, timed_out = await self._run(binary, workdir)
+            finally:
+                await asyncio.to_thread(self.workdirs.release, workdir)
+
+        if timed_out:
+            KOMPOSE_TIMEOUTS.inc()
+            return [], f"kompose did not finish within {self.timeout:g}s"
+
+        error = _kompose_error(stderr) if stderr else ""
+        manifests = await asyncio.to_thread(_load_kompose_output, stdout)
+        return manifests, error
+
+
+kompose_pool = KomposePool(
+    KOMPOSE_CONCURRENCY, KOMPOSE_MAX_QUEUE, KOMPOSE_TIMEOUT, KOMPOSE_WORKDIR_ROOT
+)
+KOMPOSE_WAITING.set_function(lambda: kompose_pool.waiting)
+atexit.register(kompose_pool.close)
+
+
+async def kubernetes_manifests(payload: dict[str, Any]) -> tuple[list[Any], str]:
+    if KUBERNETES_NATIVE_TRANSLATOR:
+        manifests = await asyncio.to_thread(translate_kubernetes_manifests, payload)
+        if manifests is not None:
+            KUBERNETES_NATIVE_TRANSLATIONS.inc()
+            return manifests, ""
+        KUBERNETES_KOMPOSE_FALLBACKS.inc()
+
+    return await kompose_pool.convert(payload)
+
+
+async def generate_kubernetes_manifest(payload: dict[str, Any]) -> dict[str, str]:
+    manifests, error = await kubernetes_manifests(payload)
+    code = await asyncio.to_thread(dump_manifests, manifests)
+    return {"code": code, "error": error}
@@ -0,0 +1,350 @@
+import math
+import time
+import bisect
+import threading
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, MutableMapping
+
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class _Sharded:
+    # Every thread writes to its own cell, so the hot path never takes a lock.
+    # The lock is only held when a thread registers its cell and on collection.
+
+    def __init__(self, size: int) -> None:
+        self._size = size
+        self._local = threading.local()
+        self._cells: list[list[float]] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> list[float]:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0.0] * self._size
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def totals(self) -> list[float]:
+        with self._lock:
+            cells = list(self._cells)
+        totals = [0.0] * self._size
+        for cell in cells:
+            for index, value in enumerate(cell):
+                totals[index] += value
+        return totals
+
+
+class _Metric:
+    # With labelnames the metric is a family: samples are recorded on the
+    # children returned by labels(), one per combination of label values.
+    # Looking up an existing child is a plain dict read.
+
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], Any] = {}
+        self._children_lock = threading.Lock()
+
+    def _child(self) -> Any:
+        return type(self)(self.name, self.documentation)
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._children_lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def samples(self) -> list[tuple[tuple[str, ...], Any]]:
+        if not self.labelnames:
+            return [((), self)]
+        with self._children_lock:
+            return sorted(self._children.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._shards = _Sharded(1)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.cell()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = ()
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._shards = _Sharded(1)
+        self._function: Callable[[], float] | None = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._shards.cell()[0] += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._shards.cell()[0] -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    @contextmanager
+    def track_inprogress(self) -> Iterator[None]:
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    @property
+    def value(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._shards.totals()[0]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # One slot per bucket, one for +Inf, then sum.
+        self._shards = _Sharded(len(self.buckets) + 2)
+
+    def _child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        cell = self._shards.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> dict[str, Any]:
+        totals = self._shards.totals()
+        cumulative: list[tuple[float, float]] = []
+        running = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), totals[:-1]):
+            running += count
+            cumulative.append((bound, running))
+        return {"buckets": cumulative, "count": running, "sum": totals[-1]}
+
+
+REGISTRY: dict[str, Counter | Gauge | Histogram] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric_class: type, name: str, documentation: str, **kwargs: Any) -> Any:
+    with _registry_lock:
+        metric = REGISTRY.get(name)
+        if metric is None:
+            metric = metric_class(name, documentation, **kwargs)
+            REGISTRY[name] = metric
+        elif not isinstance(metric, metric_class):
+            raise ValueError(f"Metric {name} is already registered as {metric.kind}")
+        return metric
+
+
+def counter(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return _register(Counter, name, documentation, labelnames=labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+    return _register(Gauge, name, documentation, labelnames=labelnames)
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    labelnames: tuple[str, ...] = (),
+) -> Histogram:
+    return _register(
+        Histogram, name, documentation, labelnames=labelnames, buckets=buckets
+    )
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = (
+        f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    # Prometheus text exposition format, version 0.0.4.
+    with _registry_lock:
+        metrics = sorted(REGISTRY.values(), key=lambda metric: metric.name)
+
+    lines: list[str] = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for values, sample in metric.samples():
+            labels = _format_labels(metric.labelnames, values)
+            if not isinstance(sample, Histogram):
+                lines.append(f"{metric.name}{labels} {_format_value(sample.value)}")
+                continue
+
+            snapshot = sample.snapshot()
+            for bound, count in snapshot["buckets"]:
+                bucket_labels = _format_labels(
+                    metric.labelnames + ("le",), values + (_format_value(bound),)
+                )
+                lines.append(
+                    f"{metric.name}_bucket{bucket_labels} {_format_value(count)}"
+                )
+            lines.append(f"{metric.name}_sum{labels} {_format_value(snapshot['sum'])}")
+            lines.append(
+                f"{metric.name}_count{labels} {_format_value(snapshot['count'])}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = histogram(
+    "ctk_http_request_duration_seconds",
+    "Time spent serving HTTP requests, including streamed bodies.",
+    labelnames=("method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = gauge(
+    "ctk_http_requests_in_flight",
+    "HTTP requests currently being served.",
+)
+HTTP_REQUEST_DB_STATEMENTS = histogram(
+    "ctk_http_request_db_statements",
+    "SQL statements executed per HTTP request.",
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+    labelnames=("route",),
+)
+HTTP_REQUEST_DB_SECONDS = histogram(
+    "ctk_http_request_db_seconds",
+    "Time spent executing SQL statements per HTTP request.",
+    labelnames=("route",),
+)
+
+# [statements, seconds] of the request being served. The list is shared with
+# the threadpool and greenlet contexts that run its queries.
+_request_database_usage: ContextVar[list[float] | None] = ContextVar(
+    "request_database_usage", default=None
+)
+
+
+def record_request_statement(seconds: float) -> None:
+    usage = _request_database_usage.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += seconds
+
+
+# Any token is a valid method, so anything outside the standard set shares
+# one label instead of adding a series per client-chosen name.
+HTTP_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+_Scope = MutableMapping[str, Any]
+_Send = Callable[[MutableMapping[str, Any]], Awaitable[None]]
+
+
+class RequestMetricsMiddleware:
+    # Plain ASGI middleware: no per-request task or body wrapping like
+    # BaseHTTPMiddleware. Routes are labelled by their path template, and
+    # requests that match no route share one label.
+
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: _Scope, receive: Any, send: _Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: MutableMapping[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        usage = [0.0, 0.0]
+        token = _request_database_usage.set(usage)
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            _request_database_usage.reset(token)
+
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+            HTTP_REQUEST_DB_STATEMENTS.labels(route).observe(usage[0])
+            HTTP_REQUEST_DB_SECONDS.labels(route).observe(usage[1])
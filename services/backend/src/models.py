@@ -4,13 +4,16 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     SmallInteger,
     Integer,
     String,
     Text,
+    cast,
     func,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import column_property, relationship
 
 
 class User(Base):
@@ -43,7 +46,15 @@ class Project(Base):
     visibility = Column(SmallInteger, nullable=False, default=1)
     name = Column(String(500), nullable=False, default="Untitled")
     uuid = Column(String(500), nullable=False, unique=True, index=True)
-    data = Column(Text, nullable=False)
+    data = Column(JSONB, nullable=False)
+    # The canvas as Postgres renders it, for responses that embed it verbatim.
+    data_json = column_property(cast(data, Text), deferred=True)
+    # Digest of `data` computed at write time so listings never load the blob.
+    node_count = Column(Integer, nullable=False, default=0, server_default="0")
+    service_count = Column(Integer, nullable=False, default=0, server_default="0")
+    data_hash = Column(String(64), nullable=True)
+    # Bumped by every write; exposed as the ETag for If-Match updates.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
@@ -55,3 +66,8 @@ class Project(Base):
     )
 
     owner = relationship("User", back_populates="projects")
+
+    __table_args__ = (
+        # Serves keyset pagination: WHERE owner_id = ? ORDER BY created_at, id.
+        Index("ix_projects_owner_id_created_at_id", "owner_id", "created_at", "id"),
+    )
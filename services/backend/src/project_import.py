@@ -0,0 +1,373 @@
+import os
+import asyncio
+import hashlib
+import multiprocessing
+
+import yaml
+import httpx
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from cache import TTLCache
+from metrics import counter
+
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _SafeLoader
+
+
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(2 * 1024 * 1024)))
+IMPORT_TIMEOUT = float(os.getenv("IMPORT_TIMEOUT", "20"))
+IMPORT_MAX_CONNECTIONS = int(os.getenv("IMPORT_MAX_CONNECTIONS", "50"))
+IMPORT_CHUNK_SIZE = 64 * 1024
+
+IMPORT_CACHE_TTL = float(os.getenv("IMPORT_CACHE_TTL", "3600"))
+IMPORT_FETCH_CACHE_ENTRIES = int(os.getenv("IMPORT_FETCH_CACHE_ENTRIES", "256"))
+IMPORT_PARSE_CACHE_ENTRIES = int(os.getenv("IMPORT_PARSE_CACHE_ENTRIES", "256"))
+
+# Compose files are a handful of levels deep and rarely have more than a few
+# thousand nodes; the node limit counts aliases as often as they are used.
+IMPORT_MAX_DEPTH = int(os.getenv("IMPORT_MAX_DEPTH", "64"))
+IMPORT_MAX_NODES = int(os.getenv("IMPORT_MAX_NODES", "200000"))
+
+IMPORT_BULK_MAX_ITEMS = int(os.getenv("IMPORT_BULK_MAX_ITEMS", "1000"))
+IMPORT_BULK_CONCURRENCY = int(os.getenv("IMPORT_BULK_CONCURRENCY", "16"))
+IMPORT_PARSE_WORKERS = int(os.getenv("IMPORT_PARSE_WORKERS", str(os.cpu_count() or 2)))
+
+_http_client: httpx.AsyncClient | None = None
+_parse_pool: ProcessPoolExecutor | None = None
+
+# url -> {"body", "etag", "last_modified"}, revalidated with a conditional GET.
+_fetch_cache: TTLCache[dict[str, Any]] = TTLCache(
+    IMPORT_FETCH_CACHE_ENTRIES, IMPORT_CACHE_TTL
+)
+# sha256(body) -> parsed document. Cached documents are shared between
+# requests and must be treated as read-only.
+_parse_cache: TTLCache[Any] = TTLCache(IMPORT_PARSE_CACHE_ENTRIES, IMPORT_CACHE_TTL)
+
+IMPORT_FETCH_CACHE_HITS = counter(
+    "ctk_import_fetch_cache_hits_total",
+    "Imports answered from the fetch cache after a 304 revalidation.",
+)
+IMPORT_FETCH_CACHE_MISSES = counter(
+    "ctk_import_fetch_cache_misses_total",
+    "Imports that had to download the full document.",
+)
+IMPORT_PARSE_CACHE_HITS = counter(
+    "ctk_import_parse_cache_hits_total",
+    "Imports whose YAML was already parsed.",
+)
+IMPORT_PARSE_CACHE_MISSES = counter(
+    "ctk_import_parse_cache_misses_total",
+    "Imports whose YAML had to be parsed.",
+)
+
+
+class ImportFetchError(Exception):
+    pass
+
+
+class ImportParseError(Exception):
+    pass
+
+
+# libyaml composes nested collections recursively on the C stack, which a
+# few ten thousand nested flow brackets are enough to overflow.
+_SAFE_BRACKET_COUNT = 10_000
+
+
+def _check_flow_depth(content: bytes) -> None:
+    # Every flow level needs a bracket, so documents with few of them cannot
+    # be deep enough to matter and skip the walk over the event stream.
+    if content.count(b"[") + content.count(b"{") <= _SAFE_BRACKET_COUNT:
+        return
+
+    loader = _SafeLoader(content)
+    try:
+        depth = 0
+        while loader.check_event():
+            event = loader.get_event()
+            if isinstance(event, yaml.CollectionStartEvent):
+                depth += 1
+                if depth > IMPORT_MAX_DEPTH:
+                    raise ImportParseError(
+                        f"Imported YAML is nested deeper than {IMPORT_MAX_DEPTH}"
+                    )
+            elif isinstance(event, yaml.CollectionEndEvent):
+                depth -= 1
+    finally:
+        loader.dispose()
+
+
+def _node_children(node: yaml.Node) -> list[yaml.Node]:
+    if isinstance(node, yaml.MappingNode):
+        return [child for pair in node.value for child in pair]
+    return node.value
+
+
+def _check_node_limits(root: yaml.Node) -> None:
+    # Sizes and heights are computed over the composed node graph, where an
+    # alias is a shared node rather than a copy, so an alias bomb costs one
+    # visit per distinct collection. A collection met again while it is still
+    # being visited is a recursive alias. Scalars are leaves and are counted
+    # by their parent.
+    if isinstance(root, yaml.ScalarNode):
+        return
+
+    sizes: dict[int, int] = {}
+    heights: dict[int, int] = {}
+    visiting: set[int] = set()
+    stack: list[tuple[yaml.Node, bool]] = [(root, False)]
+
+    while stack:
+        node, finished = stack.pop()
+        key = id(node)
+
+        if not finished:
+            if key in visiting:
+                raise ImportParseError("Imported YAML contains a recursive alias")
+            if key not in sizes:
+                visiting.add(key)
+                stack.append((node, True))
+                stack.extend(
+                    (child, False)
+                    for child in _node_children(node)
+                    if not isinstance(child, yaml.ScalarNode)
+                )
+            continue
+
+        visiting.discard(key)
+        size = height = 1
+        for child in _node_children(node):
+            if isinstance(child, yaml.ScalarNode):
+                size += 1
+                height = max(height, 2)
+            else:
+                size += sizes[id(child)]
+                height = max(height, heights[id(child)] + 1)
+
+        if size > IMPORT_MAX_NODES:
+            raise ImportParseError(
+                f"Imported YAML expands to more than {IMPORT_MAX_NODES} nodes"
+            )
+        if height > IMPORT_MAX_DEPTH:
+            raise ImportParseError(
+                f"Imported YAML is nested deeper than {IMPORT_MAX_DEPTH}"
+            )
+        sizes[key] = size
+        heights[key] = height
+
+
+class _LimitedSafeLoader(_SafeLoader):
+    # Limits are checked between composing and constructing, before any
+    # Python objects are built for the document.
+
+    def construct_document(self, node: yaml.Node) -> Any:
+        _check_node_limits(node)
+        return super().construct_document(node)
+
+    def construct_timestamp_text(self, node: yaml.ScalarNode) -> str:
+        return self.construct_scalar(node)
+
+
+# Compose has no date values, and datetime objects would not survive the JSON
+# the canvas is stored as, so timestamps keep their original text.
+_LimitedSafeLoader.add_constructor(
+    "tag:yaml.org,2002:timestamp", _LimitedSafeLoader.construct_timestamp_text
+)
+
+
+def load_import_yaml(content: bytes) -> Any:
+    try:
+        _check_flow_depth(content)
+        return yaml.load(content, Loader=_LimitedSafeLoader) or {}
+    except yaml.YAMLError as error:
+        raise ImportParseError(str(error)) from error
+    except RecursionError as error:
+        # Only reachable with the pure Python composer.
+        raise ImportParseError(
+            f"Imported YAML is nested deeper than {IMPORT_MAX_DEPTH}"
+        ) from error
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(IMPORT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=IMPORT_MAX_CONNECTIONS,
+                max_keepalive_connections=IMPORT_MAX_CONNECTIONS // 2,
+            ),
+        )
+    return _http_client
+
+
+def set_http_client(client: httpx.AsyncClient | None) -> None:
+    # Lets tests point the import path at a stand-in server or transport.
+    global _http_client
+    _http_client = client
+
+
+async def close_http_client() -> None:
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def clear_import_caches() -> None:
+    _fetch_cache.clear()
+    _parse_cache.clear()
+
+
+def _revalidation_headers(cached: dict[str, Any] | None) -> dict[str, str]:
+    headers: dict[str, str] = {}
+    if cached is None:
+        return headers
+    if cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+async def fetch_import_source(url: str, max_bytes: int = IMPORT_MAX_BYTES) -> bytes:
+    if not url.startswith(("http://", "https://")):
+        raise ImportFetchError("Import URL must use http or https")
+
+    cached = _fetch_cache.get(url)
+    chunks: list[bytes] = []
+    received = 0
+
+    try:
+        async with get_http_client().stream(
+            "GET", url, headers=_revalidation_headers(cached)
+        ) as response:
+            if cached is not None and response.status_code == 304:
+                IMPORT_FETCH_CACHE_HITS.inc()
+                _fetch_cache.set(url, cached)
+                return cached["body"]
+
+            response.raise_for_status()
+
+            content_length = response.headers.get("Content-Length", "")
+            if content_length.isdigit() and int(content_length) > max_bytes:
+                raise ImportFetchError(f"Imported file exceeds {max_bytes} bytes")
+
+            async for chunk in response.aiter_bytes(IMPORT_CHUNK_SIZE):
+                received += len(chunk)
+                if received > max_bytes:
+                    raise ImportFetchError(f"Imported file exceeds {max_bytes} bytes")
+                chunks.append(chunk)
+
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except httpx.HTTPError as error:
+        raise ImportFetchError(str(error)) from error
+
+    IMPORT_FETCH_CACHE_MISSES.inc()
+    body = b"".join(chunks)
+
+    if etag or last_modified:
+        _fetch_cache.set(
+            url, {"body": body, "etag": etag, "last_modified": last_modified}
+        )
+
+    return body
+
+
+def parse_import_source(content: bytes) -> Any:
+    digest = hashlib.sha256(content).hexdigest()
+
+    parsed = _parse_cache.get(digest)
+    if parsed is not None:
+        IMPORT_PARSE_CACHE_HITS.inc()
+        return parsed
+
+    IMPORT_PARSE_CACHE_MISSES.inc()
+    parsed = load_import_yaml(content)
+    _parse_cache.set(digest, parsed)
+    return parsed
+
+
+async def fetch_import_sources(
+    urls: list[str], concurrency: int = IMPORT_BULK_CONCURRENCY
+) -> list[bytes | ImportFetchError]:
+    # At most `concurrency` downloads run at once; failures are returned in
+    # place of the body so one bad URL does not sink the batch.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(url: str) -> bytes | ImportFetchError:
+        async with semaphore:
+            try:
+                return await fetch_import_source(url)
+            except ImportFetchError as error:
+                return error
+
+    return await asyncio.gather(*(fetch(url) for url in urls))
+
+
+def _parse_in_worker(content: bytes) -> tuple[Any, str | None]:
+    # Runs in the parse pool. Errors travel back as text, since YAML errors
+    # carry marks that do not always pickle.
+    try:
+        return load_import_yaml(content), None
+    except ImportParseError as error:
+        return None, str(error)
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+
+    if _parse_pool is None:
+        # Workers are spawned rather than forked from a process that already
+        # runs an event loop and a threadpool.
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=IMPORT_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+
+def close_parse_pool() -> None:
+    global _parse_pool
+
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+async def parse_import_sources(
+    contents: list[bytes],
+) -> list[tuple[Any, str | None]]:
+    # Bulk counterpart of parse_import_source: documents missing from the
+    # parse cache are parsed in parallel in the process pool.
+    loop = asyncio.get_running_loop()
+    parsed_sources: list[tuple[Any, str | None]] = []
+    pending: dict[int, tuple[str, asyncio.Future[tuple[Any, str | None]]]] = {}
+
+    for index, content in enumerate(contents):
+        digest = hashlib.sha256(content).hexdigest()
+        parsed = _parse_cache.get(digest)
+        if parsed is not None:
+            IMPORT_PARSE_CACHE_HITS.inc()
+        else:
+            IMPORT_PARSE_CACHE_MISSES.inc()
+            pending[index] = (
+                digest,
+                loop.run_in_executor(get_parse_pool(), _parse_in_worker, content),
+            )
+        parsed_sources.append((parsed, None))
+
+    for index, (digest, future) in pending.items():
+        parsed, error = await future
+        if error is None:
+            _parse_cache.set(digest, parsed)
+        parsed_sources[index] = (parsed, error)
+    return parsed_sources
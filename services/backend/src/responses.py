@@ -0,0 +1,99 @@
+import re
+import json
+import uuid
+
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the build environment
+    orjson = None
+
+
+class RawJSON:
+    # Marks an already-serialized JSON document that must be embedded as-is.
+    __slots__ = ("value",)
+
+    def __init__(self, value: str | bytes) -> None:
+        self.value = value.encode("utf-8") if isinstance(value, str) else value
+
+
+_orjson_fragment = getattr(orjson, "Fragment", None)
+
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, RawJSON):
+        return _orjson_fragment(value.value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _dumps_with_placeholders(content: Any, encode: Any) -> bytes:
+    # Without native fragment support, RawJSON values are encoded as unique
+    # string tokens and then swapped for the raw bytes.
+    nonce = uuid.uuid4().hex
+    fragments: list[bytes] = []
+
+    def default(value: Any) -> Any:
+        if isinstance(value, RawJSON):
+            fragments.append(value.value)
+            return f"__raw_json_{nonce}_{len(fragments) - 1}__"
+        raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+    rendered = encode(content, default)
+    for index, fragment in enumerate(fragments):
+        token = f'"__raw_json_{nonce}_{index}__"'.encode("utf-8")
+        rendered = rendered.replace(token, fragment, 1)
+    return rendered
+
+
+def _stdlib_encode(content: Any, default: Any) -> bytes:
+    return json.dumps(
+        content,
+        default=default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _orjson_encode(content: Any, default: Any) -> bytes:
+    return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is None:
+        return _dumps_with_placeholders(content, _stdlib_encode)
+    try:
+        if _orjson_fragment is None:
+            return _dumps_with_placeholders(content, _orjson_encode)
+        return _orjson_encode(content, _orjson_default)
+    except TypeError:
+        # orjson rejects integers wider than 64 bits, which json.loads and
+        # PyYAML both produce; the stdlib encoder writes them as they are.
+        return _dumps_with_placeholders(content, _stdlib_encode)
+
+
+def dumps_str(content: Any) -> str:
+    return dumps(content).decode("utf-8")
+
+
+# orjson reads integers wider than 64 bits as floats. Those need at least 20
+# digits in a row, so only documents with such a run take the stdlib parser.
+_WIDE_INTEGER = re.compile(r"\d{20}")
+_WIDE_INTEGER_BYTES = re.compile(rb"\d{20}")
+
+
+def loads(content: str | bytes) -> Any:
+    if orjson is None:
+        return json.loads(content)
+    wide_integer = _WIDE_INTEGER_BYTES if isinstance(content, bytes) else _WIDE_INTEGER
+    if wide_integer.search(content):
+        return json.loads(content)
+    return orjson.loads(content)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,133 @@
+import io
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from ruamel.yaml import YAML  # noqa: E402
+from ruamel.yaml.scalarstring import DoubleQuotedScalarString  # noqa: E402
+
+from app import app  # noqa: E402
+from manifest_generation import (  # noqa: E402
+    ComposeFragmentCache,
+    _sequence_indent_four,
+    generate_docker_compose_yaml,
+    render_docker_compose_yaml,
+)
+
+
+def generate_with_section_dumps(payload: dict) -> str:
+    # The previous generator, kept as a baseline: a new YAML() per call and
+    # one dump per section. Only the version 2/3 layout is reproduced.
+    output = io.StringIO()
+    yaml = YAML()
+    yaml.indent(mapping=2, sequence=4, offset=2)
+    yaml.preserve_quotes = True
+    wrote_document = False
+
+    def dump_chunk(data: dict, transform: object = None) -> None:
+        nonlocal wrote_document
+        yaml.explicit_start = not wrote_document
+        yaml.dump(data, output, transform=transform)
+        wrote_document = True
+
+    dump_chunk({"version": DoubleQuotedScalarString(payload["version"])})
+    output.write("\n")
+    if payload.get("services"):
+        dump_chunk({"services": payload["services"]}, _sequence_indent_four)
+        output.write("\n")
+    if payload.get("networks"):
+        dump_chunk({"networks": payload["networks"]})
+        output.write("\n")
+    if payload.get("volumes"):
+        dump_chunk({"volumes": payload["volumes"]})
+    return output.getvalue()
+
+
+def build_payload(service_count: int) -> dict:
+    services = {}
+    for index in range(service_count):
+        services[f"service-{index}"] = {
+            "image": f"registry.example.com/team/app-{index}:1.2.3",
+            "restart": "unless-stopped",
+            "ports": [f"{8000 + index}:80"],
+            "environment": {f"VAR_{env}": f"value-{env}" for env in range(20)},
+            "labels": [f"traefik.http.routers.r{index}.rule=Host(`a.b`)"] * 4,
+            "depends_on": [f"service-{index - 1}"] if index else [],
+            "volumes": [f"data-{index % 5}:/var/lib/app"],
+            "deploy": {"replicas": 2, "resources": {"limits": {"cpus": "0.5"}}},
+        }
+
+    return {
+        "version": "3.8",
+        "services": services,
+        "networks": {"backend": {"driver": "bridge"}},
+        "volumes": {f"data-{index}": {"driver": "local"} for index in range(5)},
+    }
+
+
+def measure(function: object, duration: float) -> tuple[int, float]:
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        function()
+        calls += 1
+    return calls, time.perf_counter() - start
+
+
+def main() -> None:
+    duration = float(os.getenv("BENCH_SECONDS", "3"))
+    client = TestClient(app)
+
+    for service_count in (50, 100, 200, 300):
+        payload = build_payload(service_count)
+        body = json.dumps({"data": payload})
+        assert generate_with_section_dumps(payload) == (
+            generate_docker_compose_yaml(payload)
+        )
+
+        calls, elapsed = measure(lambda: generate_with_section_dumps(payload), duration)
+        print(
+            f"{service_count:>4} services  section dumps (baseline)    "
+            f"{calls / elapsed:8.1f} calls/s"
+        )
+
+        calls, elapsed = measure(
+            lambda: generate_docker_compose_yaml(payload), duration
+        )
+        print(
+            f"{service_count:>4} services  generate_docker_compose_yaml "
+            f"{calls / elapsed:8.1f} calls/s"
+        )
+
+        # One service changes between calls, as when the editor regenerates
+        # after a single edit.
+        fragments = ComposeFragmentCache(service_count * 4)
+        render_docker_compose_yaml(payload, fragments)
+        edits = iter(range(10**9))
+
+        def edit_and_render() -> None:
+            service = payload["services"]["service-0"]
+            service["environment"]["VAR_0"] = f"edit-{next(edits)}"
+            render_docker_compose_yaml(payload, fragments)
+
+        calls, elapsed = measure(edit_and_render, duration)
+        print(
+            f"{service_count:>4} services  render_docker_compose_yaml (1 edit) "
+            f"{calls / elapsed:8.1f} calls/s"
+        )
+
+        calls, elapsed = measure(
+            lambda: client.post("/generate/docker-compose", content=body), duration
+        )
+        print(
+            f"{service_count:>4} services  POST /generate/docker-compose "
+            f"{calls / elapsed:8.1f} req/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
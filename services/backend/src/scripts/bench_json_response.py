@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from responses import FastJSONResponse, RawJSON  # noqa: E402
+
+
+def build_canvas(service_count: int) -> dict:
+    nodes = {}
+    for index in range(service_count):
+        key = f"service-{index}"
+        nodes[key] = {
+            "key": key,
+            "type": "SERVICE",
+            "position": {"top": index * 10, "left": index * 20},
+            "inputs": [f"ip_{key}"],
+            "outputs": [f"op_{key}"],
+            "canvasConfig": {"node_name": f"svc{index}"},
+            "serviceConfig": {
+                "image": f"registry.example.com/team/app-{index}:1.2.3",
+                "environment": {f"VAR_{env}": "x" * 40 for env in range(30)},
+                "labels": [f"traefik.http.routers.r{index}.rule=Host(`a.b`)"] * 5,
+                "ports": [f"{8000 + index}:80"],
+            },
+        }
+    return {"canvas": {"nodes": nodes, "connections": [], "networks": {}}}
+
+
+def project_payload(data: object) -> dict:
+    return {
+        "id": 1,
+        "owner_id": 1,
+        "visibility": 0,
+        "name": "benchmark",
+        "uuid": "benchmark",
+        "data": data,
+        "created_at": "2026-01-01T00:00:00Z",
+        "updated_at": "2026-01-01T00:00:00Z",
+    }
+
+
+def main() -> None:
+    number = int(os.getenv("BENCH_NUMBER", "20"))
+
+    for service_count in (10, 100, 500):
+        canvas = build_canvas(service_count)
+        canvas_text = json.dumps(canvas)
+
+        cases = {
+            "stdlib (jsonable_encoder + json)": lambda: JSONResponse(
+                jsonable_encoder(project_payload(canvas))
+            ),
+            "fast encoder, native data": lambda: FastJSONResponse(
+                project_payload(canvas)
+            ),
+            "fast encoder, raw passthrough": lambda: FastJSONResponse(
+                project_payload(RawJSON(canvas_text))
+            ),
+        }
+
+        print(f"{service_count} services ({len(canvas_text) / 1024:.0f} KiB canvas)")
+        for name, case in cases.items():
+            seconds = timeit.timeit(case, number=number) / number
+            print(f"  {name:<36} {seconds * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx  # noqa: E402
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import database  # noqa: E402
+
+from app import app  # noqa: E402
+from project_import import set_http_client  # noqa: E402
+
+# Counts the SQL statements and wall time of each write endpoint against the
+# database configured through the usual POSTGRES_* variables.
+
+COMPOSE_SOURCE = b"""
+services:
+  web:
+    image: nginx
+    depends_on: [api]
+  api:
+    image: example/api
+    volumes: [data:/var/lib/api]
+volumes:
+  data: {}
+"""
+
+statements: list[str] = []
+
+
+def _record(conn, cursor, statement, parameters, context, executemany) -> None:
+    if statement.strip().lower() != "select 1":
+        statements.append(statement)
+
+
+def measure(label: str, send: object, repeat: int) -> object:
+    response = None
+    total_statements = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        statements.clear()
+        response = send()
+        total_statements += len(statements)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<10} {total_statements / repeat:5.1f} statements/request "
+        f"{elapsed / repeat * 1000:8.2f} ms/request"
+    )
+    return response
+
+
+def main() -> None:
+    repeat = int(os.getenv("BENCH_REPEAT", "50"))
+    sync_engine = (
+        database.async_engine.sync_engine if database.async_engine else database.engine
+    )
+    event.listen(sync_engine, "before_cursor_execute", _record)
+    set_http_client(
+        httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=COMPOSE_SOURCE)
+            )
+        )
+    )
+
+    with TestClient(app) as client:
+        suffix = uuid.uuid4().hex[:8]
+        measure(
+            "register",
+            lambda: client.post(
+                "/auth/registration/",
+                json={
+                    "username": f"bench-{uuid.uuid4().hex[:12]}",
+                    "email": f"{uuid.uuid4().hex[:12]}@bench.local",
+                    "password1": "bench-password",
+                    "password2": "bench-password",
+                },
+            ),
+            max(1, repeat // 10),
+        )
+
+        client.post(
+            "/auth/registration/",
+            json={
+                "username": f"bench-{suffix}",
+                "email": f"{suffix}@bench.local",
+                "password1": "bench-password",
+                "password2": "bench-password",
+            },
+        )
+        tokens = client.post(
+            "/auth/login/",
+            json={"username": f"bench-{suffix}", "password": "bench-password"},
+        ).json()
+        headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+        # Warm the authenticated user cache so it does not skew the counts.
+        client.get("/auth/self/", headers=headers)
+
+        data = {"canvas": {"nodes": {}, "connections": []}}
+        project = measure(
+            "create",
+            lambda: client.post(
+                "/projects/", json={"name": "bench", "data": data}, headers=headers
+            ),
+            repeat,
+        ).json()
+        measure(
+            "update",
+            lambda: client.put(
+                f"/projects/{project['uuid']}/",
+                json={"name": "bench", "data": data},
+                headers=headers,
+            ),
+            repeat,
+        )
+        measure(
+            "import",
+            lambda: client.post(
+                "/projects/import/",
+                json={"url": "https://bench.local/docker-compose.yml"},
+                headers=headers,
+            ),
+            repeat,
+        )
+        measure(
+            "delete",
+            lambda: client.delete(f"/projects/{project['uuid']}/", headers=headers),
+            1,
+        )
+
+
+if __name__ == "__main__":
+    main()
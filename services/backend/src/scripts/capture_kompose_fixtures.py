@@ -0,0 +1,46 @@
+import os
+import sys
+import asyncio
+import tempfile
+
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from manifest_generation import KomposePool, dump_manifests  # noqa: E402
+
+# Converts every compose file in tests/fixtures/kubernetes with the kompose
+# binary on the PATH and stores the manifests, without annotations, under
+# tests/fixtures/kubernetes/kompose. The translator tests compare against them.
+
+FIXTURES = Path(__file__).resolve().parents[2] / "tests" / "fixtures" / "kubernetes"
+
+
+async def capture(fixture: Path, output: Path) -> None:
+    payload = yaml.safe_load(fixture.read_text())
+    with tempfile.TemporaryDirectory() as workdir_root:
+        pool = KomposePool(1, 1, 60, workdir_root)
+        try:
+            manifests, error = await pool.convert(payload)
+        finally:
+            pool.close()
+
+    if error:
+        raise SystemExit(f"{fixture.name}: {error}")
+
+    manifests.sort(key=lambda item: (item["kind"], item["metadata"]["name"]))
+    output.write_text(dump_manifests(manifests))
+    print(f"{fixture.name}: {len(manifests)} objects")
+
+
+def main() -> None:
+    output_dir = FIXTURES / "kompose"
+    output_dir.mkdir(exist_ok=True)
+    for fixture in sorted(FIXTURES.glob("*.yaml")):
+        asyncio.run(capture(fixture, output_dir / fixture.name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import tracemalloc
+
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import CanvasBuilder, project_data_values  # noqa: E402
+
+# Time, peak traced memory and live allocations of turning a parsed compose
+# document into the canvas and the column values an import writes.
+
+
+def build_document(service_count: int) -> dict:
+    services = {}
+    for index in range(service_count):
+        services[f"service-{index}"] = {
+            "image": f"registry.example.com/team/app-{index}:1.2.3",
+            "environment": {f"VAR_{env}": f"value-{env}" for env in range(20)},
+            "labels": [f"traefik.http.routers.r{index}.rule=Host(`a.b`)"] * 4,
+            "depends_on": [f"service-{index - 1}"] if index else [],
+            "volumes": [f"data-{index % 5}:/var/lib/app"],
+            "networks": ["backend"],
+        }
+
+    return {
+        "services": services,
+        "networks": {"backend": {"driver": "bridge"}},
+        "volumes": {f"data-{index}": {"driver": "local"} for index in range(5)},
+    }
+
+
+def measure(label: str, function: Callable[[], Any]) -> Any:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    statistics = tracemalloc.take_snapshot().statistics("filename")
+    tracemalloc.stop()
+
+    blocks = sum(stat.count for stat in statistics)
+    print(
+        f"{label:<30} {elapsed * 1000:8.2f} ms  peak {peak / 1024:8.1f} KiB  "
+        f"{blocks:7d} live blocks"
+    )
+    return result
+
+
+def main() -> None:
+    service_count = int(os.getenv("PROFILE_SERVICES", "1000"))
+    document = build_document(service_count)
+
+    namespace = "https://example.com/compose.yml"
+    measure("canvas, random ids", lambda: CanvasBuilder().build(document))
+    canvas = measure(
+        "canvas, deterministic ids", lambda: CanvasBuilder(namespace).build(document)
+    )
+    measure("column values", lambda: project_data_values(canvas))
+
+
+if __name__ == "__main__":
+    main()
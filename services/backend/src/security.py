@@ -1,32 +1,82 @@
 import os
 import hmac
+import time
 import base64
+import asyncio
 import hashlib
 import secrets
+import threading
 
 import jwt
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Callable, Optional, TypeVar
 
 from jwt import PyJWTError
 
+from metrics import counter, gauge, histogram
+
 
 JWT_SECRET = os.getenv("JWT_SECRET", "ctk-local-dev-secret")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_LIFETIME = timedelta(days=15)
 REFRESH_TOKEN_LIFETIME = timedelta(days=30)
 
+PASSWORD_HASH_ITERATIONS = 120000
+PASSWORD_HASHER_WORKERS = int(os.getenv("PASSWORD_HASHER_WORKERS", "4"))
+PASSWORD_HASHER_MAX_PENDING = int(os.getenv("PASSWORD_HASHER_MAX_PENDING", "64"))
+
+_T = TypeVar("_T")
+
+# pbkdf2_hmac releases the GIL, so a small thread pool gives real parallelism
+# without blocking the event loop.
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASHER_WORKERS, thread_name_prefix="password-hasher"
+)
+_password_pending = 0
+_password_pending_lock = threading.Lock()
+
+PASSWORD_HASH_WAIT_SECONDS = histogram(
+    "ctk_password_hash_wait_seconds",
+    "Time password hashing jobs spend queued before a worker picks them up.",
+)
+PASSWORD_HASH_SECONDS = histogram(
+    "ctk_password_hash_seconds",
+    "Time spent computing PBKDF2 password digests.",
+)
+PASSWORD_HASH_REJECTED = counter(
+    "ctk_password_hash_rejected_total",
+    "Password hashing jobs rejected because the worker pool was saturated.",
+)
+PASSWORD_HASH_PENDING = gauge(
+    "ctk_password_hash_pending",
+    "Password hashing jobs queued or running.",
+)
+PASSWORD_HASH_PENDING.set_function(lambda: _password_pending)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
 
 def _utc_now() -> datetime:
     return datetime.now(UTC)
 
 
+def _pbkdf2(raw_password: str, salt: str) -> bytes:
+    with PASSWORD_HASH_SECONDS.time():
+        return hashlib.pbkdf2_hmac(
+            "sha256",
+            raw_password.encode("utf-8"),
+            salt.encode("utf-8"),
+            PASSWORD_HASH_ITERATIONS,
+        )
+
+
 def hash_password(raw_password: str) -> str:
     salt = secrets.token_hex(16)
-    digest = hashlib.pbkdf2_hmac(
-        "sha256", raw_password.encode("utf-8"), salt.encode("utf-8"), 120000
-    )
+    digest = _pbkdf2(raw_password, salt)
     return f"{salt}${base64.b64encode(digest).decode('utf-8')}"
 
 
@@ -36,16 +86,60 @@ def verify_password(raw_password: str, password_hash: str) -> bool:
     except ValueError:
         return False
 
-    expected_digest = hashlib.pbkdf2_hmac(
-        "sha256", raw_password.encode("utf-8"), salt.encode("utf-8"), 120000
-    )
+    expected_digest = _pbkdf2(raw_password, salt)
     provided_digest = base64.b64decode(encoded_hash.encode("utf-8"))
     return hmac.compare_digest(expected_digest, provided_digest)
 
 
-def create_token(user_id: int, token_type: str, ttl: timedelta) -> str:
+def _release_password_slot(_: Any) -> None:
+    global _password_pending
+    with _password_pending_lock:
+        _password_pending -= 1
+
+
+async def _run_in_password_pool(function: Callable[..., _T], *args: Any) -> _T:
+    global _password_pending
+
+    with _password_pending_lock:
+        if _password_pending >= PASSWORD_HASHER_MAX_PENDING:
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusy()
+        _password_pending += 1
+
+    submitted_at = time.perf_counter()
+
+    def run() -> _T:
+        PASSWORD_HASH_WAIT_SECONDS.observe(time.perf_counter() - submitted_at)
+        return function(*args)
+
+    # The slot is released when the job finishes, not when the caller stops
+    # waiting: a cancelled request leaves its hash running in the worker.
+    try:
+        future = _password_executor.submit(run)
+    except BaseException:
+        _release_password_slot(None)
+        raise
+    future.add_done_callback(_release_password_slot)
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password_async(raw_password: str) -> str:
+    return await _run_in_password_pool(hash_password, raw_password)
+
+
+async def verify_password_async(raw_password: str, password_hash: str) -> bool:
+    return await _run_in_password_pool(verify_password, raw_password, password_hash)
+
+
+def create_token(
+    user_id: int,
+    token_type: str,
+    ttl: timedelta,
+    claims: Optional[dict[str, Any]] = None,
+) -> str:
     now = _utc_now()
     payload = {
+        **(claims or {}),
         "sub": str(user_id),
         "type": token_type,
         "iat": int(now.timestamp()),
@@ -54,8 +148,8 @@ def create_token(user_id: int, token_type: str, ttl: timedelta) -> str:
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-def create_access_token(user_id: int) -> str:
-    return create_token(user_id, "access", ACCESS_TOKEN_LIFETIME)
+def create_access_token(user_id: int, claims: Optional[dict[str, Any]] = None) -> str:
+    return create_token(user_id, "access", ACCESS_TOKEN_LIFETIME, claims)
 
 
 def create_refresh_token(user_id: int) -> str:
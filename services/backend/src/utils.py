@@ -1,16 +1,44 @@
+import os
+import copy
 import json
+import uuid
+import base64
+import hashlib
 
 from datetime import UTC, datetime
-from typing import Any
+from typing import Any, Iterator
 
 from fastapi import Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import Text, cast, event, tuple_
+from sqlalchemy.orm import ORMExecuteState, Session, make_transient_to_detached
 
-from database import get_db
-from models import User
+from cache import TTLCache
+from database import Database, get_db
+from models import Project, User
+from responses import RawJSON
 from security import create_access_token, create_refresh_token, decode_token
 
 
+# Writes made in this process drop cached users right away. Other workers
+# keep their snapshot until it expires, so a changed or deleted user can stay
+# authenticated there for up to USER_CACHE_TTL seconds.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_ENTRIES = int(os.getenv("USER_CACHE_ENTRIES", "10000"))
+# Read-only endpoints may build the user from the access token claims
+# instead of loading it; a deleted user keeps read access until expiry.
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "").lower() in {
+    "1",
+    "true",
+    "yes",
+}
+
+USER_CLAIM_FIELDS = ("username", "email", "first_name", "last_name")
+USER_COLUMNS = ("id", "password_hash", "created_at", "updated_at") + USER_CLAIM_FIELDS
+
+# user id -> detached snapshot of the row, merged into request sessions.
+_user_cache: TTLCache[User] = TTLCache(USER_CACHE_ENTRIES, USER_CACHE_TTL)
+
+
 DEFAULT_PROJECT = {
     "canvas": {
         "position": {"top": 0, "left": 0, "scale": 1},
@@ -39,37 +67,140 @@ def _serialize_user(user: Any) -> dict[str, Any]:
     }
 
 
-def serialize_project(project: Any) -> dict[str, Any]:
+def serialize_project(project: Any, raw_data: bool = False) -> dict[str, Any]:
+    # raw_data expects the query to have undeferred Project.data_json, which
+    # is spliced into the response without being parsed or re-encoded.
+    return {
+        "id": project.id,
+        "owner_id": project.owner_id,
+        "visibility": int(project.visibility),
+        "name": project.name,
+        "uuid": project.uuid,
+        "data": RawJSON(project.data_json) if raw_data else project.data,
+        "version": project.version,
+        "created_at": format_datetime(project.created_at),
+        "updated_at": format_datetime(project.updated_at),
+    }
+
+
+# RETURNING list for writes, shaped for serialize_project(row, raw_data=True).
+PROJECT_RESPONSE_COLUMNS = (
+    Project.id,
+    Project.owner_id,
+    Project.visibility,
+    Project.name,
+    Project.uuid,
+    cast(Project.data, Text).label("data_json"),
+    Project.version,
+    Project.created_at,
+    Project.updated_at,
+)
+
+
+def serialize_project_summary(project: Any) -> dict[str, Any]:
     return {
         "id": project.id,
         "owner_id": project.owner_id,
         "visibility": int(project.visibility),
         "name": project.name,
         "uuid": project.uuid,
-        "data": project.data,
+        "node_count": project.node_count,
+        "service_count": project.service_count,
+        "data_hash": project.data_hash,
         "created_at": format_datetime(project.created_at),
         "updated_at": format_datetime(project.updated_at),
     }
 
 
-def default_project_json() -> str:
-    return json.dumps(DEFAULT_PROJECT)
+def canonical_json(data: Any) -> str:
+    try:
+        return json.dumps(data, sort_keys=True, separators=(",", ":"))
+    except TypeError:
+        # Mappings that mix key types (YAML allows {1: a, B: b}) cannot be
+        # sorted as they are; hash them the way JSONB stores them, keys as
+        # strings.
+        return json.dumps(_with_json_keys(data), sort_keys=True, separators=(",", ":"))
+
+
+def _with_json_keys(data: Any) -> Any:
+    if isinstance(data, dict):
+        return {
+            key if isinstance(key, str) else json.dumps(key): _with_json_keys(value)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [_with_json_keys(item) for item in data]
+    return data
+
+
+def _canonical_json_chunks(data: Any, depth: int) -> Iterator[str]:
+    # The text of canonical_json, one mapping entry at a time down to `depth`
+    # levels (project data -> canvas -> nodes), so a large canvas is never
+    # held as one serialized string.
+    if depth == 0 or not isinstance(data, dict):
+        yield canonical_json(data)
+        return
+    if not all(isinstance(key, str) for key in data):
+        yield canonical_json(data)
+        return
+
+    separator = "{"
+    for key in sorted(data):
+        yield f"{separator}{json.dumps(key)}:"
+        yield from _canonical_json_chunks(data[key], depth - 1)
+        separator = ","
+    yield "{}" if separator == "{" else "}"
+
+
+def canonical_json_digest(data: Any) -> str:
+    digest = hashlib.sha256()
+    for chunk in _canonical_json_chunks(data, 3):
+        digest.update(chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def project_data_values(data: Any) -> dict[str, Any]:
+    node_count = 0
+    service_count = 0
+
+    canvas = data.get("canvas") if isinstance(data, dict) else None
+    nodes = canvas.get("nodes") if isinstance(canvas, dict) else None
+    if isinstance(nodes, dict):
+        node_count = len(nodes)
+        service_count = sum(
+            1
+            for node in nodes.values()
+            if isinstance(node, dict) and node.get("type") == "SERVICE"
+        )
+
+    return {
+        "data": data,
+        "node_count": node_count,
+        "service_count": service_count,
+        "data_hash": canonical_json_digest(data),
+    }
+
+
+def default_project_data() -> dict[str, Any]:
+    return copy.deepcopy(DEFAULT_PROJECT)
 
 
-def normalize_project_data(raw_data: Any) -> str:
+def normalize_project_data(raw_data: Any) -> Any:
     if raw_data is None:
-        return default_project_json()
+        return default_project_data()
 
+    # Older clients send the canvas as a (possibly multiply) JSON-encoded
+    # string; unwrap it so the JSONB column stores the document itself.
     if isinstance(raw_data, str):
         try:
             parsed = json.loads(raw_data)
             while isinstance(parsed, str):
                 parsed = json.loads(parsed)
-            return json.dumps(parsed)
+            return parsed
         except (json.JSONDecodeError, TypeError):
             return raw_data
 
-    return json.dumps(raw_data)
+    return raw_data
 
 
 def load_json_payload(raw_body: bytes) -> dict[str, Any]:
@@ -108,10 +239,38 @@ def get_bearer_token(request: Request) -> str | None:
     return token
 
 
-def get_optional_current_user(
-    request: Request,
-    db: Session = Depends(get_db),
-) -> User | None:
+def _detached_user(values: dict[str, Any]) -> User:
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    _user_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user_on_write(mapper: Any, connection: Any, target: User) -> None:
+    invalidate_cached_user(target.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_users_on_statement(state: ORMExecuteState) -> None:
+    # UPDATE/DELETE statements run through session.execute() (the
+    # single-statement ... RETURNING writes) skip the mapper events above and
+    # can match any number of rows, so they drop every cached user.
+    if not (state.is_update or state.is_delete):
+        return
+    if getattr(state.statement.table, "name", None) == User.__tablename__:
+        _user_cache.clear()
+
+
+def user_token_claims(user: Any) -> dict[str, Any]:
+    return {"user": {field: getattr(user, field) for field in USER_CLAIM_FIELDS}}
+
+
+def _access_token_payload(request: Request) -> dict[str, Any] | None:
     token = get_bearer_token(request)
     if token is None:
         return None
@@ -120,21 +279,59 @@ def get_optional_current_user(
     if not payload or payload.get("type") != "access":
         raise HTTPException(status_code=401, detail="Token is invalid or expired")
 
-    user_id = payload.get("sub")
-    if user_id is None:
+    if payload.get("sub") is None:
         raise HTTPException(status_code=401, detail="Token is invalid or expired")
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    return payload
+
+
+def _load_user(db: Session, user_id: int) -> User:
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        return db.merge(cached, load=False)
+
+    user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(
             status_code=401,
             detail={"code": "user_not_found", "detail": "User not found"},
         )
 
+    _user_cache.set(
+        user_id,
+        _detached_user({column: getattr(user, column) for column in USER_COLUMNS}),
+    )
     return user
 
 
-def get_current_user(
+async def get_optional_current_user(
+    request: Request,
+    db: Database = Depends(get_db),
+) -> User | None:
+    payload = _access_token_payload(request)
+    if payload is None:
+        return None
+
+    return await db.run(_load_user, int(payload["sub"]))
+
+
+async def get_optional_reader(
+    request: Request,
+    db: Database = Depends(get_db),
+) -> User | None:
+    payload = _access_token_payload(request)
+    if payload is None:
+        return None
+
+    claims = payload.get("user")
+    if AUTH_TRUST_TOKEN_CLAIMS and isinstance(claims, dict):
+        values = {field: claims.get(field) for field in USER_CLAIM_FIELDS}
+        return _detached_user({"id": int(payload["sub"]), **values})
+
+    return await db.run(_load_user, int(payload["sub"]))
+
+
+async def get_current_user(
     optional_user: User | None = Depends(get_optional_current_user),
 ) -> User:
     if optional_user is None:
@@ -160,6 +357,55 @@ def can_edit_project(project: Any, user: Any | None) -> bool:
     return False
 
 
+def project_etag(project_id: int, version: int) -> str:
+    # The row id keeps a project deleted and re-created under the same uuid,
+    # whose version starts over, from matching tags of the old row.
+    return f'"{project_id}-{version}"'
+
+
+def _etag_revisions(header: str, weak: bool) -> set[tuple[int, int]]:
+    revisions: set[tuple[int, int]] = set()
+    for tag in header.split(","):
+        tag = tag.strip()
+        if weak and tag.startswith("W/"):
+            tag = tag[2:]
+        if len(tag) < 2 or not tag[0] == tag[-1] == '"':
+            continue
+        project_id, _, version = tag[1:-1].partition("-")
+        if project_id.isdigit() and version.isdigit():
+            revisions.add((int(project_id), int(version)))
+    return revisions
+
+
+def if_match_revisions(header: str | None) -> set[tuple[int, int]] | None:
+    # None when any revision may be overwritten (no header or "*"). Weak or
+    # foreign tags match nothing, so the write fails its precondition.
+    if header is None or header.strip() == "*":
+        return None
+    return _etag_revisions(header, weak=False)
+
+
+def if_none_match_revisions(header: str | None) -> set[tuple[int, int]] | None:
+    # None for "*", which matches whatever revision is stored. GET compares
+    # tags weakly, so W/"7-3" is as good as "7-3".
+    if header is None:
+        return set()
+    if header.strip() == "*":
+        return None
+    return _etag_revisions(header, weak=True)
+
+
+def project_revision_in(revisions: set[tuple[int, int]]) -> Any:
+    return tuple_(Project.id, Project.version).in_(sorted(revisions))
+
+
+def can_edit_project_clause(user: Any | None) -> Any:
+    # can_edit_project as a WHERE clause, so writes authorize in the statement.
+    if user:
+        return Project.owner_id == user.id
+    return Project.owner_id.is_(None)
+
+
 def extract_depends_on(depends_on: Any) -> list[str]:
     if isinstance(depends_on, dict):
         return list(depends_on.keys())
@@ -251,31 +497,136 @@ def build_volume_node(
     }
 
 
+def _compose_section(compose: dict[str, Any], key: str) -> dict[Any, Any]:
+    section = compose.get(key)
+    return section if isinstance(section, dict) else {}
+
+
+class CanvasBuilder:
+    # Builds the canvas of an imported compose document in a single pass over
+    # its services, volumes and networks. Node ids are random, or derived from
+    # `namespace` and the entity name so that importing the same source again
+    # reproduces the same canvas.
+
+    def __init__(self, namespace: str | None = None) -> None:
+        self._namespace = (
+            uuid.uuid5(uuid.NAMESPACE_URL, namespace) if namespace is not None else None
+        )
+        self._ids: dict[str, dict[Any, str]] = {}
+
+    def node_id(self, kind: str, name: Any) -> str:
+        # Connections may point at nodes that are built later, so ids are
+        # handed out on first use rather than in a pass of their own.
+        ids = self._ids.setdefault(kind, {})
+        node_id = ids.get(name)
+        if node_id is None:
+            if self._namespace is None:
+                node_id = f"{kind}-{uuid.uuid4()}"
+            else:
+                node_id = f"{kind}-{uuid.uuid5(self._namespace, f'{kind}/{name}')}"
+            ids[name] = node_id
+        return node_id
+
+    def build(self, compose: dict[str, Any]) -> dict[str, Any]:
+        services = _compose_section(compose, "services")
+        volumes = _compose_section(compose, "volumes")
+        networks = _compose_section(compose, "networks")
+        nodes: dict[str, Any] = {}
+        connections: list[list[str]] = []
+        self._ids = {}
+        node_id = self.node_id
+
+        for index, (name, config) in enumerate(services.items()):
+            service_id = node_id("service", name)
+            nodes[service_id] = build_service_node(name, service_id, config, index)
+            if not isinstance(config, dict):
+                continue
+
+            for dependency in extract_depends_on(config.get("depends_on")):
+                if dependency in services:
+                    connections.append([service_id, node_id("service", dependency)])
+            for mount in extract_service_volume_mounts(config.get("volumes")):
+                if mount in volumes:
+                    connections.append([node_id("volume", mount), service_id])
+
+        index = len(services)
+        for name, config in volumes.items():
+            volume_id = node_id("volume", name)
+            nodes[volume_id] = build_volume_node(
+                name, volume_id, config if isinstance(config, dict) else {}, index
+            )
+            index += 1
+
+        for name, config in networks.items():
+            network_id = node_id("network", name)
+            nodes[network_id] = build_network_node(name, network_id, config, index)
+            index += 1
+
+        return {
+            "canvas": {
+                "position": dict(DEFAULT_PROJECT["canvas"]["position"]),
+                "nodes": nodes,
+                "connections": connections,
+                "networks": {},
+            }
+        }
+
+
+def encode_cursor(created_at: datetime, project_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{project_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int] | None:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_at, project_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(project_id)
+    except (ValueError, UnicodeError):
+        return None
+
+
 def build_pagination_urls(
     request: Request,
     limit: int,
-    offset: int,
-    count: int,
+    offset: int | None,
+    count: int | None,
+    next_cursor: str | None = None,
 ) -> tuple[str | None, str | None]:
-    base_url = str(request.url).split("?", 1)[0]
+    # Links keep the caller's other query parameters (view=summary and
+    # friends) and only move the window.
+    url = request.url
+
+    # Keyset pagination only walks forward from an opaque cursor.
+    if offset is None:
+        if next_cursor is None:
+            return None, None
+        next_url = url.remove_query_params("offset").include_query_params(
+            limit=limit, cursor=next_cursor
+        )
+        return str(next_url), None
 
+    url = url.remove_query_params("cursor")
     next_url = None
     previous_url = None
 
     next_offset = offset + limit
     if next_offset < count:
-        next_url = f"{base_url}?limit={limit}&offset={next_offset}"
+        next_url = str(url.include_query_params(limit=limit, offset=next_offset))
 
     previous_offset = offset - limit
     if previous_offset >= 0:
-        previous_url = f"{base_url}?limit={limit}&offset={previous_offset}"
+        previous_url = str(
+            url.include_query_params(limit=limit, offset=previous_offset)
+        )
 
     return next_url, previous_url
 
 
 def auth_success_payload(user: Any) -> dict[str, Any]:
     return {
-        "access_token": create_access_token(user.id),
+        "access_token": create_access_token(user.id, user_token_claims(user)),
         "refresh_token": create_refresh_token(user.id),
         "user": _serialize_user(user),
     }
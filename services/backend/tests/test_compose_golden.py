@@ -0,0 +1,74 @@
+import json
+
+from pathlib import Path
+
+import pytest
+
+from manifest_generation import (
+    ComposeFragmentCache,
+    _compose_sections,
+    _sequence_indent_four,
+    _sequence_indent_one,
+    generate_docker_compose_yaml,
+    iter_docker_compose_yaml,
+    render_docker_compose_yaml,
+)
+
+
+# Output captured from the generator before emitter reuse, the single-pass
+# dump and the linear transforms. _compose_sections has no counterpart there;
+# its expected text comes from its first, line-by-line version.
+FIXTURES = Path(__file__).parent / "fixtures" / "compose"
+GENERATE_CASES = json.loads((FIXTURES / "generate.json").read_text())
+TRANSFORM_CASES = json.loads((FIXTURES / "transforms.json").read_text())
+
+TRANSFORMS = {
+    "sequence_indent_four": _sequence_indent_four,
+    "sequence_indent_one": _sequence_indent_one,
+    "compose_sections": _compose_sections,
+}
+
+
+@pytest.mark.parametrize("name", sorted(TRANSFORMS))
+def test_transforms_match_golden_output(name):
+    transform = TRANSFORMS[name]
+    for text, expected in TRANSFORM_CASES[name]:
+        assert transform(text) == expected, repr(text)
+
+
+@pytest.mark.parametrize("case", GENERATE_CASES)
+def test_generate_matches_golden_output(case):
+    assert generate_docker_compose_yaml(case["payload"]) == case["expected"]
+
+
+@pytest.mark.parametrize("case", GENERATE_CASES)
+def test_render_matches_golden_output(case):
+    fragments = ComposeFragmentCache(64)
+    payload = case["payload"]
+
+    assert "".join(iter_docker_compose_yaml(payload)) == case["expected"]
+    assert render_docker_compose_yaml(payload, fragments) == case["expected"]
+    # The second render is served from the fragment cache.
+    assert render_docker_compose_yaml(payload, fragments) == case["expected"]
+
+
+def test_fragment_cache_keeps_nan_and_null_apart():
+    fragments = ComposeFragmentCache(64)
+    nan = {"services": {"web": {"image": "nginx", "x-ratio": float("nan")}}}
+    null = {"services": {"web": {"image": "nginx", "x-ratio": None}}}
+
+    assert render_docker_compose_yaml(nan, fragments) == (
+        generate_docker_compose_yaml(nan)
+    )
+    assert render_docker_compose_yaml(null, fragments) == (
+        generate_docker_compose_yaml(null)
+    )
+
+
+def test_fragment_cache_renders_wide_integers():
+    fragments = ComposeFragmentCache(64)
+    payload = {"services": {"web": {"image": "nginx", "x-id": 2**70}}}
+
+    assert render_docker_compose_yaml(payload, fragments) == (
+        generate_docker_compose_yaml(payload)
+    )
@@ -0,0 +1,53 @@
+import asyncio
+
+from generation_cache import (
+    cached_generation,
+    clear_generation_cache,
+    generation_cache_key,
+)
+from manifest_generation import generate_docker_compose_yaml
+
+
+def _payload(*service_names: str) -> dict:
+    return {
+        "version": "3.8",
+        "services": {name: {"image": f"{name}:latest"} for name in service_names},
+    }
+
+
+async def _generate(data: dict) -> dict[str, str]:
+    return {"code": generate_docker_compose_yaml(data)}
+
+
+def test_reordered_services_get_distinct_keys():
+    assert generation_cache_key("docker-compose", _payload("web", "db")) != (
+        generation_cache_key("docker-compose", _payload("db", "web"))
+    )
+
+
+def test_reordered_service_keys_get_distinct_keys():
+    first = {"services": {"web": {"image": "nginx", "ports": ["80:80"]}}}
+    second = {"services": {"web": {"ports": ["80:80"], "image": "nginx"}}}
+    assert generation_cache_key("docker-compose", first) != (
+        generation_cache_key("docker-compose", second)
+    )
+
+
+def test_reordered_payloads_get_their_own_yaml():
+    clear_generation_cache()
+
+    async def run() -> list[tuple[dict[str, str], bool]]:
+        return [
+            await cached_generation("docker-compose", payload, _generate)
+            for payload in (
+                _payload("web", "db"),
+                _payload("db", "web"),
+                _payload("db", "web"),
+            )
+        ]
+
+    (first, first_hit), (second, second_hit), (third, third_hit) = asyncio.run(run())
+    assert (first_hit, second_hit, third_hit) == (False, False, True)
+    assert first["code"].index("web:") < first["code"].index("db:")
+    assert second["code"].index("db:") < second["code"].index("web:")
+    assert third == second
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest_generation import dump_manifests, iter_manifests_yaml
+
+
+def _manifest(name: str) -> dict:
+    container = {
+        "name": name,
+        "env": [{"name": f"KEY_{index}", "value": "v" * index} for index in range(40)],
+    }
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": name},
+        "spec": {"replicas": 1, "template": {"spec": {"containers": [container]}}},
+    }
+
+
+def test_interleaved_streams_on_shared_threads_match_dump():
+    # StreamingResponse resumes each generator on whichever pool thread is
+    # free, so steps of different streams share threads.
+    streams = {
+        name: [_manifest(f"{name}-{index}") for index in range(50)]
+        for name in ("alpha", "beta", "gamma")
+    }
+    generators = {name: iter_manifests_yaml(items) for name, items in streams.items()}
+    chunks: dict[str, list[str]] = {name: [] for name in streams}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pending = dict(generators)
+        while pending:
+            steps = {
+                name: pool.submit(next, generator, None)
+                for name, generator in pending.items()
+            }
+            for name, step in steps.items():
+                chunk = step.result()
+                if chunk is None:
+                    del pending[name]
+                else:
+                    chunks[name].append(chunk)
+
+    for name, items in streams.items():
+        assert "".join(chunks[name]) == dump_manifests(items)
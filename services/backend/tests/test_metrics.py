@@ -0,0 +1,29 @@
+import asyncio
+
+from metrics import RequestMetricsMiddleware, render_prometheus
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 204, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _send(message):
+    pass
+
+
+def _request(method: str) -> None:
+    scope = {"type": "http", "method": method, "path": "/"}
+    asyncio.run(RequestMetricsMiddleware(_ok)(scope, None, _send))
+
+
+def test_unknown_methods_share_one_label():
+    _request("PATCH")
+    _request("BREW")
+    _request("X-PROBE-123")
+
+    output = render_prometheus()
+    assert 'method="PATCH",route="unmatched",status="204"' in output
+    assert 'method="other",route="unmatched",status="204"' in output
+    assert "BREW" not in output
+    assert "X-PROBE-123" not in output
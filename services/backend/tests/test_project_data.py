@@ -0,0 +1,18 @@
+import json
+
+from utils import canonical_json, canonical_json_digest
+
+
+def test_mixed_key_types_hash_like_the_stored_document():
+    data = {"canvas": {"nodes": {"web": {"environment": {1: "a", "B": "b"}}}}}
+    stored = json.loads(json.dumps(data))
+
+    assert canonical_json(data) == canonical_json(stored)
+    assert canonical_json_digest(data) == canonical_json_digest(stored)
+
+
+def test_digest_matches_canonical_json():
+    data = {"canvas": {"nodes": {"b": {"x": 1}, "a": {"y": [2, 3]}}}, "z": None}
+    assert canonical_json_digest(data) == canonical_json_digest(
+        json.loads(canonical_json(data))
+    )
@@ -0,0 +1,23 @@
+import pytest
+
+from project_import import ImportParseError, load_import_yaml
+
+
+def test_timestamps_keep_their_text():
+    document = load_import_yaml(
+        b"services:\n"
+        b"  web:\n"
+        b"    image: nginx\n"
+        b"    labels:\n"
+        b"      built: 2024-01-01\n"
+        b"      at: 2024-01-01T10:00:00Z\n"
+    )
+    assert document["services"]["web"]["labels"] == {
+        "built": "2024-01-01",
+        "at": "2024-01-01T10:00:00Z",
+    }
+
+
+def test_deeply_nested_documents_are_rejected():
+    with pytest.raises(ImportParseError):
+        load_import_yaml(b"a: " + b"[" * 200 + b"]" * 200)
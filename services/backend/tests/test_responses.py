@@ -0,0 +1,14 @@
+from responses import FastJSONResponse, RawJSON, dumps, loads
+
+
+def test_wide_integers_are_serialized():
+    assert dumps({"n": 2**70, "raw": RawJSON('{"a":1}')}) == (
+        b'{"n":1180591620717411303424,"raw":{"a":1}}'
+    )
+    assert FastJSONResponse({"n": 2**70}).body == b'{"n":1180591620717411303424}'
+
+
+def test_wide_integers_are_parsed_exactly():
+    assert loads(b'{"n":1180591620717411303424}') == {"n": 2**70}
+    assert loads('{"n":[1180591620717411303424]}') == {"n": [2**70]}
+    assert loads(b'{"n":1.5,"m":18446744073709551615}') == {"n": 1.5, "m": 2**64 - 1}
@@ -150,7 +150,8 @@ export default function Project(props: IProjectProps) {
       return;
     }
 
-    const canvasData = JSON.parse(data.data);
+    const canvasData =
+      typeof data.data === "string" ? JSON.parse(data.data) : data.data;
     const nodesAsList = Object.keys(canvasData.canvas.nodes).map(
       (k) => canvasData.canvas.nodes[k]
     );
@@ -8,7 +8,7 @@ export const fetchProjects = async (limit: number, offset: number) => {
 
   const response = await axios({
     method: "get",
-    url: `${API_SERVER_URL}/projects/?limit=${limit}&offset=${offset}`,
+    url: `${API_SERVER_URL}/projects/?limit=${limit}&offset=${offset}&view=summary`,
     headers: {
       "Content-Type": "application/json",
       Authorization: `Bearer ${jwtKeys.access_token}`
@@ -23,7 +23,7 @@ export interface IProject {
   name: string;
   visibility: number;
   uuid: string;
-  data: string;
+  data: string | Record<string, any>;
   created_at: string;
   modified_at: string;
 }